@@ -0,0 +1,36 @@
+import argparse
+
+from src import utils
+from src.batch import load_config, run_batch
+
+# parse command line arguments
+parser = argparse.ArgumentParser(description="Run many Incognito configurations in one process.")
+parser.add_argument(
+    "config",
+    type=str,
+    help="Path to the JSON batch config file.",
+)
+parser.add_argument(
+    "--output",
+    type=str,
+    default=None,
+    help="Output directory for all runs and index.json. Overrides 'output' in the config file.",
+)
+parser.add_argument(
+    "--workers",
+    type=int,
+    default=None,
+    help="Number of worker processes. Overrides 'workers' in the config file.",
+)
+parser.add_argument(
+    "--verbose",
+    action="store_true",
+    help="Enable verbose output",
+)
+
+args = parser.parse_args()
+utils.set_verbose(args.verbose)
+
+config = load_config(args.config)
+index = run_batch(config, args.output, args.workers)
+print(f"{index['num_runs'] - index['num_failed']} / {index['num_runs']} runs succeeded.")
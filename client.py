@@ -0,0 +1,108 @@
+import argparse
+import json
+
+from src.server import request
+
+# parse command line arguments
+parser = argparse.ArgumentParser(description="Submit an Incognito job to a running service.")
+parser.add_argument(
+    "--host",
+    type=str,
+    default="127.0.0.1",
+    help="Host of the service (default: '127.0.0.1').",
+)
+parser.add_argument(
+    "--port",
+    type=int,
+    default=8765,
+    help="Port of the service (default: 8765).",
+)
+parser.add_argument(
+    "--unix_socket",
+    type=str,
+    default=None,
+    help="Connect to this Unix domain socket instead of TCP.",
+)
+parser.add_argument(
+    "--status",
+    action="store_true",
+    help="Show loaded datasets and running jobs instead of submitting a job.",
+)
+parser.add_argument(
+    "--evict",
+    action="store_true",
+    help="Unload --dataset (or all datasets with --evict_all) from the service instead of submitting a job.",
+)
+parser.add_argument(
+    "--evict_all",
+    action="store_true",
+    help="With --evict, unload all datasets.",
+)
+parser.add_argument(
+    "--frequency_sets_only",
+    action="store_true",
+    help="With --evict, only clear the cached frequency sets and keep the datasets loaded.",
+)
+parser.add_argument(
+    "--dataset",
+    type=str,
+    default="adult",
+    help="Dataset to use (default: 'adult').",
+)
+parser.add_argument(
+    "--k",
+    type=int,
+    default=10,
+    help="k-anonymity parameter (default: 10)",
+)
+parser.add_argument(
+    "--q_cols",
+    type=str,
+    nargs="+",
+    default=["workclass", "sex", "education", "marital-status", "native-country"],
+    help="List of quasi-identifier columns to generalize (e.g., 'workclass', 'education').",
+)
+parser.add_argument(
+    "--dropna",
+    action="store_true",
+    help="Drops records which includes NaN.",
+)
+parser.add_argument(
+    "--size_limit",
+    type=int,
+    default=None,
+    help="FOR DEBUG: Limit the size of the dataset to this number of records.",
+)
+parser.add_argument(
+    "--output",
+    type=str,
+    default=None,
+    help="Output directory for results on the server side. If not specified, results are not saved.",
+)
+
+args = parser.parse_args()
+connection = {"host": args.host, "port": args.port, "unix_socket": args.unix_socket}
+
+try:
+    if args.status:
+        response = request("GET", "/status", **connection)
+    elif args.evict:
+        body = {
+            "dataset": None if args.evict_all else args.dataset,
+            "frequency_sets_only": args.frequency_sets_only,
+        }
+        response = request("POST", "/evict", body, **connection)
+    else:
+        job = {
+            "dataset": args.dataset,
+            "q_cols": args.q_cols,
+            "k": args.k,
+            "dropna": args.dropna,
+            "size_limit": args.size_limit,
+            "output": args.output,
+        }
+        response = request("POST", "/run", job, **connection)
+except RuntimeError as e:
+    parser.exit(1, f"Error: {e}\n")
+
+print(json.dumps(response, indent=2, ensure_ascii=False))
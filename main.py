@@ -1,7 +1,10 @@
 import argparse
 
-from src import utils
+from src import planner, utils
+from src.export import check_compression
+from src.hierarchy import compile_hierarchies_by_col_names, to_hierarchy_frame
 from src.incognito import Incognito
+from src.profiler import RunProfiler
 from src.utils import vprint
 
 # parse command line arguments
@@ -42,12 +45,79 @@ parser.add_argument(
     action="store_true",
     help="Drops records which includes NaN.",
 )
+parser.add_argument(
+    "--weight_col",
+    type=str,
+    default=None,
+    help="Column holding the number of records each row represents, for pre-aggregated datasets.",
+)
 parser.add_argument(
     "--size_limit",
     type=int,
     default=None,
     help="FOR DEBUG: Limit the size of the dataset to this number of records. If None, all records are used.",
 )
+parser.add_argument(
+    "--lattice",
+    type=str,
+    choices=["object", "array"],
+    default=None,
+    help="Lattice backend (default: 'object', or chosen by --plan). 'array' stores the lattice in NumPy arrays and is faster for many quasi-identifiers.",
+)
+parser.add_argument(
+    "--backend",
+    type=str,
+    choices=["pandas", "polars"],
+    default=None,
+    help="Backend for generalization and grouping (default: 'pandas', or chosen by --plan). 'polars' is multi-threaded and requires polars.",
+)
+parser.add_argument(
+    "--plan",
+    action="store_true",
+    help="Estimate the lattice size and memory usage before running, choose the lattice/backend/workers within --memory_budget, and save the plan into metadata.json.",
+)
+parser.add_argument(
+    "--memory_budget",
+    type=int,
+    default=None,
+    help="Memory budget in MiB for --plan. The run is aborted if the estimated peak memory exceeds it.",
+)
+parser.add_argument(
+    "--verify",
+    action="store_true",
+    help="Verify the result with encoded columns and save the report into metadata.json.",
+)
+parser.add_argument(
+    "--verify_workers",
+    type=int,
+    default=None,
+    help="Number of worker processes for --verify (default: sequential).",
+)
+parser.add_argument(
+    "--verify_sample",
+    type=int,
+    default=None,
+    help="Verify only this number of randomly sampled result nodes.",
+)
+parser.add_argument(
+    "--verify_frontier",
+    type=str,
+    choices=["minimal", "maximal"],
+    default=None,
+    help="Verify only the minimal or maximal result nodes.",
+)
+parser.add_argument(
+    "--profile",
+    action="store_true",
+    help="Profile the run with cProfile and save the stats and a per-node cost histogram next to metadata.json.",
+)
+parser.add_argument(
+    "--compression",
+    type=str,
+    choices=["gzip", "zstd"],
+    default=None,
+    help="Compress the generalized CSV files ('zstd' requires zstandard).",
+)
 parser.add_argument(
     "--output",
     type=str,
@@ -57,10 +127,11 @@ parser.add_argument(
 
 args = parser.parse_args()
 utils.set_verbose(args.verbose)
+check_compression(args.compression)
 
 # read dataset
 vprint("Reading dataset:", args.dataset)
-dataset = utils.read_dataset(args.dataset)
+dataset = utils.read_dataset(args.dataset, weight_col=args.weight_col)
 vprint(f"Dataset loaded: {dataset.shape[0]} records.")
 
 # limit dataset size if specified
@@ -77,17 +148,60 @@ if args.dropna:
 # read hierarchies definition
 vprint(f"Reading generalization hierarchies for {args.q_cols}...")
 hierarchies_dir = f"Data/{args.dataset}/hierarchies"
-hierarchy = utils.read_hierarchies_by_col_names(args.q_cols, hierarchies_dir)
-# filter hierarchy
-hierarchy = hierarchy[(hierarchy["child_level"] == 0)]
+# level-0 -> level-j の対応のみをコンパイルし、データセットの値が網羅されているか検証
+compiled_hierarchies = compile_hierarchies_by_col_names(
+    args.q_cols, hierarchies_dir, dataset=dataset
+)
+hierarchy = to_hierarchy_frame(compiled_hierarchies)
+
+# 実行前の見積もり
+run_plan = None
+if args.plan:
+    memory_budget = args.memory_budget * 2**20 if args.memory_budget is not None else None
+    run_plan = planner.plan(dataset, hierarchy, memory_budget, weight_col=args.weight_col)
+    planner.print_plan(run_plan)
+    if not run_plan["fits_in_budget"]:
+        parser.exit(
+            1,
+            "Estimated peak memory exceeds --memory_budget. "
+            "Reduce --q_cols or increase the budget.\n",
+        )
+    # 明示的に指定されていないものはplanの選択に従う
+    args.lattice = args.lattice or run_plan["lattice_backend"]
+    args.backend = args.backend or run_plan["backend"]
+    args.verify_workers = args.verify_workers or run_plan["workers"]
 
 # incognito
 print(f"Starting Incognito... with k={args.k} and quasi-identifiers: {args.q_cols}")
-incognito = Incognito(dataset, hierarchy, args.k)
-incognito.run()
+incognito = Incognito(
+    dataset,
+    hierarchy,
+    args.k,
+    lattice_backend=args.lattice or "object",
+    weight_col=args.weight_col,
+    backend=args.backend or "pandas",
+    plan=run_plan,
+)
+if args.profile:
+    profiler = RunProfiler(incognito)
+    profiler.run()
+else:
+    incognito.run()
 incognito.print_result()
 if utils.VERBOSE:
     incognito.verify_result()
+if args.verify:
+    report = incognito.verify(
+        workers=args.verify_workers,
+        sample=args.verify_sample,
+        frontier=args.verify_frontier,
+    )
+    if report["ok"]:
+        print(f"Verified {report['num_verified']} / {report['num_nodes']} nodes satisfy k-anonymity (k={args.k}).")
+    else:
+        print(f"{len(report['failures'])} nodes do not satisfy k-anonymity (k={args.k}):")
+        for failure in report["failures"]:
+            print(failure["generalization"], "min class size:", failure["min_class_size"])
 
 # 出力ディレクトリの生成
 if args.output:
@@ -99,4 +213,6 @@ else:
     output_dir = f"result/{args.dataset}_{q_cols_str}_k{args.k}_{timestamp}"
 
 # 結果保存
-incognito.save_result(output_dir)
+incognito.save_result(output_dir, compression=args.compression)
+if args.profile:
+    profiler.save(output_dir)
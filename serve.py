@@ -0,0 +1,76 @@
+import argparse
+
+from src import utils
+from src.server import MAX_FREQUENCY_SETS, DatasetStore, IncognitoService, make_server
+
+# parse command line arguments
+parser = argparse.ArgumentParser(
+    description="Run Incognito as a long-running service which keeps datasets in memory."
+)
+parser.add_argument(
+    "--host",
+    type=str,
+    default="127.0.0.1",
+    help="Host to listen on (default: '127.0.0.1').",
+)
+parser.add_argument(
+    "--port",
+    type=int,
+    default=8765,
+    help="Port to listen on (default: 8765).",
+)
+parser.add_argument(
+    "--unix_socket",
+    type=str,
+    default=None,
+    help="Listen on this Unix domain socket instead of TCP.",
+)
+parser.add_argument(
+    "--max_jobs",
+    type=int,
+    default=1,
+    help="Maximum number of jobs running simultaneously (default: 1).",
+)
+parser.add_argument(
+    "--max_frequency_sets",
+    type=int,
+    default=MAX_FREQUENCY_SETS,
+    help=f"Maximum number of cached frequency sets per dataset; least recently used ones are evicted (default: {MAX_FREQUENCY_SETS}).",
+)
+parser.add_argument(
+    "--preload",
+    type=str,
+    nargs="+",
+    default=[],
+    help="Datasets to load at startup (e.g., 'adult').",
+)
+parser.add_argument(
+    "--verbose",
+    action="store_true",
+    help="Enable verbose output",
+)
+
+args = parser.parse_args()
+if args.max_jobs < 1:
+    parser.error("--max_jobs must be at least 1.")
+if args.max_frequency_sets < 1:
+    parser.error("--max_frequency_sets must be at least 1.")
+utils.set_verbose(args.verbose)
+
+store = DatasetStore(max_frequency_sets=args.max_frequency_sets)
+for dataset_name in args.preload:
+    store.get_dataset(dataset_name)
+service = IncognitoService(store, max_jobs=args.max_jobs)
+try:
+    server = make_server(service, args.host, args.port, args.unix_socket)
+except ValueError as e:
+    parser.error(str(e))
+
+address = args.unix_socket or f"http://{args.host}:{args.port}"
+print(f"Incognito service listening on {address} (max_jobs={args.max_jobs})")
+try:
+    server.serve_forever()
+except KeyboardInterrupt:
+    pass
+finally:
+    server.server_close()
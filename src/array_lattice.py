@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+from typing import List, Optional
+
+from .utils import vprint
+
+
+def _expand_ranges(starts: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """
+    [starts[i], starts[i] + counts[i]) の区間を連結したインデックス列を返す
+    """
+    total = int(counts.sum())
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + offsets
+
+
+class ArrayLattice:
+    """
+    NumPy配列でノードとエッジを保持するLattice
+    Latticeと同じノード・エッジを生成するが、Nodeオブジェクトを作らないため
+    準識別子の多い大きなLatticeでもメモリ使用量と走査コストが小さい
+
+    columns: 準識別子（属性名順）、levelsの列に対応
+    levels: (ノード数, 準識別子数) の int8 配列。ノードに含まれない属性は -1
+    heights: ノードの一般化レベルの高さ
+    indptr, indices: エッジのCSR表現。ノードiの遷移先は indices[indptr[i]:indptr[i+1]]
+    marked: k匿名性を満たすNodeとしてマークされているか
+    deleted: 削除されているか
+    """
+
+    def __init__(self, hierarchy: pd.DataFrame, verbose: Optional[bool] = None) -> None:
+        self.Q: List[str] = hierarchy["column"].unique().tolist()
+        self.columns: List[str] = sorted(self.Q)
+        self.hierarchy: pd.DataFrame = hierarchy
+        self.attributes: int = 0
+        self.verbose: Optional[bool] = verbose  # Noneのときはutils.VERBOSEに従う
+
+        self.levels: np.ndarray = np.empty((0, len(self.columns)), dtype=np.int8)
+        self.heights: np.ndarray = np.empty(0, dtype=np.int32)
+        self.indptr: np.ndarray = np.zeros(1, dtype=np.int64)
+        self.indices: np.ndarray = np.empty(0, dtype=np.int64)
+        self.marked: np.ndarray = np.empty(0, dtype=bool)
+        self.deleted: np.ndarray = np.empty(0, dtype=bool)
+
+    def _set_nodes(self, levels: np.ndarray, src: np.ndarray, dst: np.ndarray) -> None:
+        """
+        ノードとエッジ (src -> dst) を設定し、CSRを構築する
+        """
+        num_nodes = levels.shape[0]
+        self.levels = levels
+        self.heights = np.where(levels >= 0, levels, 0).sum(axis=1, dtype=np.int32)
+        order = np.lexsort((dst, src))
+        self.indices = dst[order].astype(np.int64)
+        self.indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=num_nodes), out=self.indptr[1:])
+        self.marked = np.zeros(num_nodes, dtype=bool)
+        self.deleted = np.zeros(num_nodes, dtype=bool)
+
+    def _single_attribute_initialization(self) -> None:
+        """
+        単一属性の一般化について初期化、Incognitoの初期条件
+        """
+        levels = []
+        src = []
+        for q in self.Q:
+            col = self.columns.index(q)
+            generalizations = self.hierarchy[self.hierarchy["column"] == q]
+            max_generalization_level = generalizations["parent_level"].max()
+            for generalization_level in range(max_generalization_level + 1):
+                # 一つ下のレベルのノードから遷移する
+                if generalization_level > 0:
+                    src.append(len(levels) - 1)
+                level = np.full(len(self.columns), -1, dtype=np.int8)
+                level[col] = generalization_level
+                levels.append(level)
+
+        src = np.array(src, dtype=np.int64)
+        levels = np.array(levels, dtype=np.int8).reshape(-1, len(self.columns))
+        self._set_nodes(levels, src, src + 1)
+
+    def _node_generation(self) -> tuple:
+        """
+        属性数+1のノードを生成する
+        i-1個目までの属性とレベルが同じ かつ i個目の属性が左<右 の組 (p, q) を結合する
+        return: 新しいノードの親 (p, q) の、現在のLattice上のインデックス
+        """
+        active = np.flatnonzero(~self.deleted)
+        levels = self.levels[active]
+        num_cols = len(self.columns)
+
+        # 各ノードの最後の属性と、それを除いた prefix
+        last = num_cols - 1 - np.argmax((levels >= 0)[:, ::-1], axis=1)
+        prefix = levels.copy()
+        prefix[np.arange(len(active)), last] = -1
+        if len(active) > 0:
+            _, group = np.unique(prefix, axis=0, return_inverse=True)
+            group = group.reshape(-1).astype(np.int64)
+        else:
+            group = np.empty(0, dtype=np.int64)
+
+        # prefixが同じグループ内で、最後の属性が自分より大きいノードと組にする
+        key = group * (num_cols + 1) + last
+        order = np.argsort(key, kind="stable")
+        sorted_key = key[order]
+        lo = np.searchsorted(sorted_key, sorted_key, side="right")
+        hi = np.searchsorted(
+            sorted_key, group[order] * (num_cols + 1) + num_cols, side="right"
+        )
+        counts = hi - lo
+        left = np.repeat(np.arange(len(order)), counts)
+        right = _expand_ranges(lo, counts)
+        p = active[order[left]]
+        q = active[order[right]]
+
+        # Latticeと同じ (p, q) の順に並べる
+        perm = np.lexsort((q, p))
+        return p[perm], q[perm]
+
+    def _edge_generation(self, p: np.ndarray, q: np.ndarray) -> tuple:
+        """
+        新しいノード間のエッジを生成する
+        親p同士、親q同士の両方にエッジがあるとき、新しいノード間にもエッジを張る
+        return: エッジ (src, dst)
+        """
+        num_nodes = len(p)
+        num_prev = len(self.deleted)
+        if num_nodes == 0:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+
+        pair_key = p * num_prev + q  # (p, q) の順に並んでいるので昇順
+        degree = np.diff(self.indptr)
+
+        # 新しいノード a について、(pの遷移先, qの遷移先) の組を列挙
+        count_p = degree[p]
+        a = np.repeat(np.arange(num_nodes), count_p)
+        p_dst = self.indices[_expand_ranges(self.indptr[p], count_p)]
+        count_q = degree[q[a]]
+        q_dst = self.indices[_expand_ranges(self.indptr[q[a]], count_q)]
+        a = np.repeat(a, count_q)
+        p_dst = np.repeat(p_dst, count_q)
+
+        # その組を親に持つノードが存在すればエッジを張る
+        candidate = p_dst * num_prev + q_dst
+        pos = np.searchsorted(pair_key, candidate)
+        found = pos < num_nodes
+        found[found] = pair_key[pos[found]] == candidate[found]
+        return a[found], pos[found]
+
+    def graph_generation(self) -> None:
+        """
+        属性を+1したLatticeを生成する
+        """
+        vprint("node_generation: ", end="", verbose=self.verbose)
+        p, q = self._node_generation()
+        vprint(len(p), "nodes generated.", verbose=self.verbose)
+
+        # p のレベルに q の最後の属性のレベルを加える
+        q_levels = self.levels[q]
+        q_last = len(self.columns) - 1 - np.argmax((q_levels >= 0)[:, ::-1], axis=1)
+        levels = self.levels[p]
+        rows = np.arange(len(q))
+        levels[rows, q_last] = q_levels[rows, q_last]
+
+        vprint("edge_generation", verbose=self.verbose)
+        src, dst = self._edge_generation(p, q)
+        self._set_nodes(levels, src, dst)
+
+    def increment_attributes(self) -> None:
+        """
+        属性の数を1増やす
+        """
+        if self.attributes == 0:
+            self._single_attribute_initialization()
+        else:
+            self.graph_generation()
+        self.attributes += 1
+
+    # 以下、ノードをインデックスで扱うインタフェース（Latticeと共通）
+
+    def num_active(self) -> int:
+        """
+        削除されていないノード数
+        """
+        return int(np.count_nonzero(~self.deleted))
+
+    def active_nodes(self) -> List[int]:
+        """
+        削除されていないノードのインデックス
+        """
+        return np.flatnonzero(~self.deleted).tolist()
+
+    def num_edges(self) -> int:
+        """
+        エッジ数
+        """
+        return len(self.indices)
+
+    def roots(self) -> List[int]:
+        """
+        削除されていないrootノードのインデックス
+        削除されたノードからのエッジは数えない（Node.deleteと同じく、遷移元が全て削除されたノードはroot）
+        """
+        src = np.repeat(np.arange(len(self.deleted)), np.diff(self.indptr))
+        in_degree = np.bincount(
+            self.indices[~self.deleted[src]], minlength=len(self.deleted)
+        )
+        return np.flatnonzero((in_degree == 0) & ~self.deleted).tolist()
+
+    def height(self, i: int) -> int:
+        return int(self.heights[i])
+
+    def generalization(self, i: int) -> List[tuple]:
+        """
+        ノードiの一般化変換 [(column, level), ...]（属性名順）
+        """
+        return [
+            (col, int(level))
+            for col, level in zip(self.columns, self.levels[i])
+            if level >= 0
+        ]
+
+    def successors(self, i: int) -> List[int]:
+        """
+        ノードiから出るエッジの遷移先ノードのインデックス
+        """
+        return self.indices[self.indptr[i] : self.indptr[i + 1]].tolist()
+
+    def is_marked(self, i: int) -> bool:
+        return bool(self.marked[i])
+
+    def is_deleted(self, i: int) -> bool:
+        return bool(self.deleted[i])
+
+    def mark(self, i: int) -> None:
+        self.marked[i] = True
+
+    def delete(self, i: int) -> None:
+        self.deleted[i] = True
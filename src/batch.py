@@ -0,0 +1,216 @@
+"""
+Batch experiment runner
+
+Runs many (dataset, q_cols, k) configurations in one invocation. Runs are grouped
+by dataset so that ingestion and hierarchy parsing happen once per group, and runs
+in a group share one frequency-set cache, so lattice nodes common to overlapping
+QI subsets or to different k values are evaluated only once. Groups are executed
+on a process pool; when there are fewer datasets than workers, each group is split
+into contiguous chunks of its ordered runs.
+
+Config file (JSON):
+    {
+        "output": "result/nightly",
+        "workers": 4,
+        "runs": [
+            {"dataset": "adult", "q_cols": ["sex", "workclass"], "k": [5, 10]},
+            {"dataset": "adult", "q_cols": [["sex"], ["sex", "race"]], "k": 10, "dropna": true}
+        ]
+    }
+"q_cols" may be a list of columns or a list of such lists, and "k" may be an int
+or a list; each entry expands to the cartesian product.
+"""
+
+import itertools
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .incognito import Incognito
+from .server import DatasetStore
+
+
+def load_config(config_path: str) -> dict:
+    """
+    バッチ設定ファイルを読み込む
+    param config_path: path to the JSON config file
+    return: config dict
+    """
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    if "runs" not in config:
+        raise ValueError(f"Config file ({config_path}) has no 'runs'.")
+    return config
+
+
+def expand_runs(entries: List[dict]) -> List[dict]:
+    """
+    設定ファイルのrunsを個々の(dataset, q_cols, k)の実行に展開する
+    param entries: config["runs"]
+    return: list of runs, each with an "id" in config order
+    """
+    runs = []
+    for entry in entries:
+        if "q_cols" not in entry or "k" not in entry:
+            raise ValueError(f"Run must specify 'q_cols' and 'k': {entry}")
+        q_cols_list = entry["q_cols"]
+        if all(isinstance(col, str) for col in q_cols_list):
+            q_cols_list = [q_cols_list]
+        k_list = entry["k"] if isinstance(entry["k"], list) else [entry["k"]]
+
+        for q_cols, k in itertools.product(q_cols_list, k_list):
+            runs.append(
+                {
+                    "id": len(runs),
+                    "dataset": entry.get("dataset", "adult"),
+                    "q_cols": list(q_cols),
+                    "k": int(k),
+                    "dropna": bool(entry.get("dropna", False)),
+                    "size_limit": entry.get("size_limit"),
+                }
+            )
+    return runs
+
+
+def group_runs(runs: List[dict]) -> Dict[tuple, List[dict]]:
+    """
+    runsをデータセット単位にまとめ、frequency setのキャッシュを再利用しやすい順に並べる
+
+    QI数の少ない順に実行することで、大きなQI集合のLatticeが部分集合のノードを
+    キャッシュから引けるようにする。同じQI集合のrunはkだけが異なるので隣接させる。
+    return: (dataset, dropna, size_limit) -> ordered runs
+    """
+    groups: Dict[tuple, List[dict]] = {}
+    for run in runs:
+        key = (run["dataset"], run["dropna"], run["size_limit"])
+        groups.setdefault(key, []).append(run)
+    for group in groups.values():
+        group.sort(key=lambda run: (len(run["q_cols"]), sorted(run["q_cols"]), run["k"]))
+    return groups
+
+
+def split_groups(groups: Dict[tuple, List[dict]], workers: int) -> List[tuple]:
+    """
+    データセット数がworkers未満のとき、各グループを連続したチャンクに分割して並列度を確保する
+    チャンクは並び順を保った連続区間なので、キャッシュを共有しやすいrun同士は同じチャンクに残る
+    return: [(group_key, runs), ...]
+    """
+    chunks_per_group = max(1, workers // max(1, len(groups)))
+    tasks = []
+    for group_key, group in groups.items():
+        num_chunks = min(chunks_per_group, len(group))
+        for i in range(num_chunks):
+            chunk = group[len(group) * i // num_chunks : len(group) * (i + 1) // num_chunks]
+            tasks.append((group_key, chunk))
+    return tasks
+
+
+def _run_dir_name(run: dict) -> str:
+    q_cols_str = "_".join(run["q_cols"])
+    return f"{run['id']:03d}_{run['dataset']}_{q_cols_str}_k{run['k']}"
+
+
+def run_group(group_key: tuple, runs: List[dict], output_root: str) -> List[dict]:
+    """
+    同じデータセットに対するrunsを1プロセス内で順に実行する
+    失敗したrunはエラーのエントリとして記録し、残りのrunは続けて実行する
+    return: 各runの結果インデックスのエントリ
+    """
+    dataset_name, dropna, size_limit = group_key
+    entries = [dict(run, output_dir=_run_dir_name(run)) for run in runs]
+    store = DatasetStore()
+    try:
+        dataset, freq_cache = store.get_dataset(dataset_name, dropna, size_limit)
+    except Exception as e:
+        # データセットが読めなければ、このグループのrunはすべて失敗
+        for entry in entries:
+            entry.update(status="error", error=f"{type(e).__name__}: {e}")
+        return entries
+
+    for run, entry in zip(runs, entries):
+        run_dir = Path(output_root) / entry["output_dir"]
+        try:
+            hierarchy = store.get_hierarchy(dataset_name, run["q_cols"])
+            print(
+                f"Starting Incognito... with k={run['k']} and quasi-identifiers: {run['q_cols']}"
+            )
+            incognito = Incognito(dataset, hierarchy, run["k"], freq_cache=freq_cache)
+            generalizations = incognito.run()
+            incognito.save_result(str(run_dir))
+        except Exception as e:
+            entry.update(status="error", error=f"{type(e).__name__}: {e}")
+        else:
+            entry.update(
+                status="ok",
+                num_valid_generalizations=len(generalizations),
+                execution_time=incognito.execution_time,
+                num_records=len(dataset),
+            )
+    return entries
+
+
+def _failed_entries(runs: List[dict], error: BaseException) -> List[dict]:
+    """
+    workerプロセスごと失敗したときの、各runのエラーのエントリ
+    """
+    return [
+        dict(
+            run,
+            output_dir=_run_dir_name(run),
+            status="error",
+            error=f"{type(error).__name__}: {error}",
+        )
+        for run in runs
+    ]
+
+
+def run_batch(config: dict, output_root: Optional[str] = None, workers: Optional[int] = None) -> dict:
+    """
+    バッチ全体を実行し、結果インデックスを output_root/index.json に保存する
+    param config: load_configで読み込んだ設定
+    param output_root: 出力ディレクトリ（config["output"] より優先）
+    param workers: プロセス数（config["workers"] より優先）
+    return: 結果インデックス
+    """
+    if output_root is None:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_root = config.get("output", f"result/batch_{timestamp}")
+    if workers is None:
+        workers = config.get("workers", 1)
+    Path(output_root).mkdir(parents=True, exist_ok=True)
+
+    runs = expand_runs(config["runs"])
+    groups = group_runs(runs)
+    print(f"{len(runs)} runs in {len(groups)} dataset groups, {workers} workers.")
+
+    entries = []
+    if workers <= 1:
+        for group_key, group in groups.items():
+            entries.extend(run_group(group_key, group, output_root))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            tasks = split_groups(groups, workers)
+            futures = [
+                executor.submit(run_group, group_key, chunk, output_root)
+                for group_key, chunk in tasks
+            ]
+            for (_, chunk), future in zip(tasks, futures):
+                try:
+                    entries.extend(future.result())
+                except Exception as e:
+                    # workerプロセスの異常終了など。他のチャンクの結果は残す
+                    entries.extend(_failed_entries(chunk, e))
+
+    index = {
+        "num_runs": len(runs),
+        "num_failed": sum(entry["status"] != "ok" for entry in entries),
+        "runs": sorted(entries, key=lambda entry: entry["id"]),
+        "timestamp": datetime.now().isoformat(),
+    }
+    index_path = Path(output_root) / "index.json"
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    print(f"Results index saved to: {index_path}")
+    return index
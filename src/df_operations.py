@@ -1,5 +1,20 @@
 import pandas as pd
-from typing import List
+from typing import List, Optional
+
+# collapseで重み列を指定しなかったときの、レコード数の列名
+COUNT_COL = "__count__"
+
+
+def from_pandas(df: pd.DataFrame, target_cols: List[str]) -> pd.DataFrame:
+    """
+    pandasのDataFrameをこのバックエンドの形式に変換する（pandasでは何もしない）
+    polars_operations.from_pandas と同じインタフェース
+
+    df: Input DataFrame
+    target_cols: Quasi-identifier columns.
+    return: df itself
+    """
+    return df
 
 
 def generalize(df: pd.DataFrame, hierarchy_df: pd.DataFrame) -> pd.DataFrame:
@@ -43,7 +58,11 @@ def generalize(df: pd.DataFrame, hierarchy_df: pd.DataFrame) -> pd.DataFrame:
 
 
 def is_k_anonymous(
-    df: pd.DataFrame, target_cols: List[str], k: int, debug: bool = False
+    df: pd.DataFrame,
+    target_cols: List[str],
+    k: int,
+    debug: bool = False,
+    weight_col: Optional[str] = None,
 ) -> bool:
     """
     dfがtarget_colsにおいてk-匿名であるか確認する
@@ -51,15 +70,55 @@ def is_k_anonymous(
     df: Input DataFrame
     target_cols: List of columns to check for k-anonymity.
     k: The value of k for k-anonymity.
+    weight_col: Column holding the number of records each row represents. If None, each row counts as one record.
     return: True if the DataFrame is k-anonymous, False otherwise.
     """
 
     # 各target_colsの組み合わせでグループ化し、サイズをカウント
-    _df = df.copy()
-    grouped = _df.groupby(target_cols, dropna=False)
+    sizes = frequency_set(df, target_cols, weight_col)
     if debug:
-        print(grouped.size())
+        print(sizes)
     # 各グループのサイズがk以上であるか確認
-    is_k_anonymous = all(size >= k for size in grouped.size())
+    is_k_anonymous = all(size >= k for size in sizes)
 
     return is_k_anonymous
+
+
+def frequency_set(
+    df: pd.DataFrame, target_cols: List[str], weight_col: Optional[str] = None
+) -> pd.Series:
+    """
+    dfのtarget_colsにおける frequency set（同値クラスごとのレコード数）を求める
+
+    df: Input DataFrame
+    target_cols: List of columns which define the equivalence classes.
+    weight_col: Column holding the number of records each row represents. If None, each row counts as one record.
+    return: Series of class sizes indexed by the values of target_cols.
+    """
+    grouped = df.groupby(target_cols, dropna=False)
+    if weight_col is None:
+        return grouped.size()
+    return grouped[weight_col].sum()
+
+
+def collapse(
+    df: pd.DataFrame, target_cols: List[str], weight_col: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    dfをtarget_colsの値の組み合わせごとに1行にまとめ、レコード数を重みとして持たせる
+    k-匿名性の判定は重みの和で行えるので、重複の多いテーブルでは一般化・グループ化の対象が減る
+
+    df: Input DataFrame
+    target_cols: Columns to keep.
+    weight_col: Column holding the number of records each row represents. If None, each row counts as one record.
+    return: DataFrame with target_cols and a weight column (weight_col, or COUNT_COL if weight_col is None).
+    """
+    grouped = df.groupby(target_cols, dropna=False, sort=False)
+    if weight_col is None:
+        collapsed = grouped.size().rename(COUNT_COL)
+    else:
+        collapsed = grouped[weight_col].sum()
+        # 重み0の行だけの組み合わせはレコードを表さないので除く
+        collapsed = collapsed[collapsed > 0]
+    # 欠番があるとgeneralizeで存在しないインデックスを参照してしまうので、振り直す
+    return collapsed.reset_index()
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+from . import df_operations
+
+
+class EncodedTable:
+    """
+    準識別子列を整数コードに変換したテーブル
+    各列の値をlevel-0のコードに置き換え、一般化レベルごとに level-0コード -> level-jコード
+    の対応表を持つことで、一般化とグループ化を整数配列の演算だけで行う
+
+    codes: column -> 各レコードのlevel-0コード
+    level_codes: column -> [level-0コード -> level-jコード の配列 (j = 0, 1, ...)]
+    level_sizes: column -> [level-jの値の種類数 (j = 0, 1, ...)]
+    weights: 各レコードが表すレコード数（Noneのときは1）
+    """
+
+    def __init__(
+        self, T: pd.DataFrame, hierarchy: pd.DataFrame, weight_col: Optional[str] = None
+    ) -> None:
+        """
+        param T: 対象のテーブル
+        param hierarchy: 一般化階層の定義df (child_level == 0 の行)
+        param weight_col: Tの各行が表すレコード数の列。Noneのときは各行を1レコードとして扱う
+        """
+        self.Q: List[str] = hierarchy["column"].unique().tolist()
+        self.num_records: int = len(T)
+        self.weights: Optional[np.ndarray] = (
+            T[weight_col].to_numpy(dtype=np.int64) if weight_col is not None else None
+        )
+        self.codes: Dict[str, np.ndarray] = {}
+        self.level_codes: Dict[str, List[np.ndarray]] = {}
+        self.level_sizes: Dict[str, List[int]] = {}
+
+        for col in self.Q:
+            codes, uniques = pd.factorize(T[col], use_na_sentinel=False)
+            self.codes[col] = codes.astype(np.int64)
+            self.level_codes[col] = [np.arange(len(uniques), dtype=np.int64)]
+            self.level_sizes[col] = [len(uniques)]
+
+            col_hierarchy = hierarchy[hierarchy["column"] == col]
+            for level in range(1, col_hierarchy["parent_level"].max() + 1):
+                # 値の種類ごとに一般化し、level-jの値をコード化する（一般化の規則はgeneralizeと同じ）
+                generalized = df_operations.generalize(
+                    pd.DataFrame({col: uniques}),
+                    col_hierarchy[col_hierarchy["parent_level"] == level],
+                )
+                level_codes, level_uniques = pd.factorize(
+                    generalized[col], use_na_sentinel=False
+                )
+                self.level_codes[col].append(level_codes.astype(np.int64))
+                self.level_sizes[col].append(len(level_uniques))
+
+    def frequency_set(self, generalization: List[tuple]) -> np.ndarray:
+        """
+        一般化変換を適用したときの frequency set（同値クラスごとのレコード数）を求める
+        param generalization: 一般化変換 [(column, level), ...]
+        return: 各同値クラスのレコード数
+        """
+        key = np.zeros(self.num_records, dtype=np.int64)
+        num_keys = 1
+        for col, level in generalization:
+            size = self.level_sizes[col][level]
+            # キーがint64に収まらなくなる前に詰め直す
+            if num_keys * size >= 2**62:
+                _, key = np.unique(key, return_inverse=True)
+                key = key.reshape(-1)
+                num_keys = int(key.max()) + 1 if len(key) else 1
+            key = key * size + self.level_codes[col][level][self.codes[col]]
+            num_keys *= size
+
+        if num_keys > 4 * max(self.num_records, 1):
+            _, key = np.unique(key, return_inverse=True)
+            key = key.reshape(-1)
+            num_keys = int(key.max()) + 1 if len(key) else 0
+        if self.weights is None:
+            counts = np.bincount(key, minlength=num_keys)
+            return counts[counts > 0]
+        sizes = np.bincount(key, weights=self.weights, minlength=num_keys)
+        # 重み0の行だけのクラスはレコードを含まないので除く
+        return sizes[sizes > 0].astype(np.int64)
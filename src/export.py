@@ -0,0 +1,116 @@
+import os
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+# 圧縮方式 -> ファイル名の拡張子
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def check_compression(compression: Optional[str]) -> None:
+    """
+    圧縮方式が利用可能か確認する（書き出しを始める前に失敗させるため）
+    """
+    if compression not in COMPRESSION_SUFFIXES:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == "zstd":
+        try:
+            import zstandard  # noqa: F401
+        except ImportError:
+            raise ImportError(
+                "zstd compression requires zstandard. Install it with `uv pip install zstandard`."
+            )
+
+
+class ExportPipeline:
+    """
+    一般化済みテーブルのCSV書き出しを、生成と並行してスレッドで行う
+
+    submit() で渡したDataFrameは上限付きのqueueに入り、writerスレッドが書き出す。
+    queueが一杯のときsubmit()は待機するので、メモリ上に保持するテーブル数は
+    max_pending + workers 以下に抑えられる。
+    書き出しは staging_dir 上の一時ファイルに行い、完了後に output_dir へ rename するため、
+    書きかけのファイルが output_dir に現れることはない。
+    """
+
+    def __init__(
+        self,
+        output_dir: str,
+        staging_dir: str,
+        compression: Optional[str] = None,
+        workers: int = 4,
+        max_pending: int = 4,
+    ) -> None:
+        """
+        param output_dir: 書き出し先ディレクトリ
+        param staging_dir: 一時ファイルのディレクトリ（output_dirと同じファイルシステム上）
+        param compression: None, "gzip" or "zstd" ("zstd" は zstandard パッケージが必要)
+        param workers: writerスレッド数
+        param max_pending: 書き出し待ちのテーブル数の上限
+        """
+        check_compression(compression)
+        self.output_dir: Path = Path(output_dir)
+        self.staging_dir: Path = Path(staging_dir)
+        self.compression: Optional[str] = compression
+        self.workers: int = workers
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._error: Optional[BaseException] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def filename(self, stem: str) -> str:
+        """
+        圧縮方式に応じたファイル名 (例: sex0_workclass2.csv.gz)
+        """
+        return f"{stem}.csv{COMPRESSION_SUFFIXES[self.compression]}"
+
+    def __enter__(self) -> "ExportPipeline":
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+        for _ in range(self.workers):
+            self._executor.submit(self._writer)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        for _ in range(self.workers):
+            self._queue.put(None)  # writerの終了合図
+        self._executor.shutdown(wait=True)
+        try:
+            self.staging_dir.rmdir()
+        except OSError:
+            pass
+        if exc_type is None and self._error is not None:
+            raise self._error
+
+    def submit(self, filename: str, df: pd.DataFrame) -> None:
+        """
+        dfを output_dir/filename に書き出すよう依頼する（queueが一杯なら待機）
+        """
+        if self._error is not None:
+            raise self._error
+        self._queue.put((filename, df))
+
+    def _writer(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            # 失敗後もqueueは消費し続け、submit()が待機したままにならないようにする
+            if self._error is not None:
+                continue
+            filename, df = item
+            tmp_path = self.staging_dir / f"{filename}.tmp"
+            try:
+                df.to_csv(
+                    tmp_path,
+                    index=False,
+                    compression={"method": self.compression} if self.compression else None,
+                )
+                os.replace(tmp_path, self.output_dir / filename)
+            except BaseException as e:
+                self._error = e
+                if tmp_path.exists():
+                    tmp_path.unlink()
@@ -0,0 +1,153 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+class CompiledHierarchy:
+    """
+    一般化階層を整数コードで保持したもの
+    階層定義CSVの各行は葉 (level-0の値) から根までのパスで、j列目がlevel-jの値
+
+    column: 準識別子名（データセット上の列名）
+    labels: level -> そのレベルの値の配列（labels[0] が葉）
+    codes: (葉の数, レベル数) の int32 配列。codes[i, j] は葉iのlevel-jの値の labels[j] 上のインデックス
+    """
+
+    def __init__(self, column: str, labels: List[np.ndarray], codes: np.ndarray) -> None:
+        self.column: str = column
+        self.labels: List[np.ndarray] = labels
+        self.codes: np.ndarray = codes
+
+    @property
+    def height(self) -> int:
+        """
+        最大の一般化レベル
+        """
+        return self.codes.shape[1] - 1
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        level-0 -> level-j (j >= 1) の対応をIncognitoの階層定義dfの形式で返す
+        return: columns = ["child", "child_level", "parent", "parent_level", "column"]
+        """
+        leaves = self.labels[0][self.codes[:, 0]]
+        frames = [
+            pd.DataFrame(
+                {
+                    "child": leaves,
+                    "child_level": 0,
+                    "parent": self.labels[level][self.codes[:, level]],
+                    "parent_level": level,
+                }
+            )
+            for level in range(1, self.height + 1)
+        ]
+        if frames:
+            hierarchy_df = pd.concat(frames, ignore_index=True)
+        else:
+            hierarchy_df = pd.DataFrame(
+                columns=["child", "child_level", "parent", "parent_level"]
+            )
+        hierarchy_df["column"] = self.column
+        return hierarchy_df
+
+    def validate_coverage(self, values: pd.Series) -> None:
+        """
+        データセットの値がすべて葉として定義されているか確認する（NaNは除く）
+        param values: データセットの列
+        """
+        values = pd.Series(values.dropna().unique())
+        missing = values[~values.isin(self.labels[0])]
+        if len(missing) > 0:
+            raise ValueError(
+                f"Hierarchy for {self.column} does not cover {len(missing)} values "
+                f"in the dataset: {missing.tolist()[:10]}"
+            )
+
+
+def compile_hierarchy(file_path: str, col_name: str) -> CompiledHierarchy:
+    """
+    階層定義CSVを一度だけ読み込み、CompiledHierarchyに変換する
+    各値の親が一意であること（一貫性）を検証する
+
+    param file_path: path to the hierarchy csv file
+    param col_name: column name of the hierarchy
+    return: CompiledHierarchy
+    """
+    csv = pd.read_csv(file_path, sep=";", header=None)
+    if csv.isna().any().any():
+        raise ValueError(f"Hierarchy file ({file_path}) has empty cells.")
+    csv = csv.drop_duplicates()
+
+    labels = []
+    codes = np.empty(csv.shape, dtype=np.int32)
+    for level in range(csv.shape[1]):
+        level_codes, level_labels = pd.factorize(csv.iloc[:, level])
+        codes[:, level] = level_codes
+        labels.append(np.asarray(level_labels, dtype=object))
+
+    # 各レベルの値が、一つ上のレベルでただ一つの親を持つか
+    for level in range(1, csv.shape[1]):
+        pairs = np.unique(codes[:, [level - 1, level]], axis=0)
+        if len(pairs) != len(np.unique(pairs[:, 0])):
+            children, counts = np.unique(pairs[:, 0], return_counts=True)
+            inconsistent = labels[level - 1][children[counts > 1]].tolist()
+            raise ValueError(
+                f"Hierarchy file ({file_path}) has values with multiple parents "
+                f"at level {level}: {inconsistent[:10]}"
+            )
+
+    # csvとdatatable上のcol名が違うものは置換する
+    if col_name == "salary-class":
+        col_name = "income"
+
+    return CompiledHierarchy(col_name, labels, codes)
+
+
+def compile_hierarchies_by_col_names(
+    col_names: List[str],
+    hierarchies_dir: str,
+    dataset: Optional[pd.DataFrame] = None,
+    workers: Optional[int] = None,
+) -> Dict[str, CompiledHierarchy]:
+    """
+    col_namesの階層定義を並列に読み込み、コンパイルする
+
+    param col_names: list of column names to read hierarchies
+    param hierarchies_dir: directory containing hierarchy CSV files
+    param dataset: 指定された場合は、データセットの値が階層定義に網羅されているか検証する
+    param workers: number of threads (default: one per column)
+    return: column name -> CompiledHierarchy (in the order of col_names)
+    """
+    if not os.path.exists(hierarchies_dir):
+        raise ValueError(f"Hierarchies directory: {hierarchies_dir} does not exist.")
+
+    hierarchy_paths = []
+    for col_name in col_names:
+        hierarchy_path = os.path.join(hierarchies_dir, f"{col_name}.csv")
+        if not os.path.exists(hierarchy_path):
+            raise ValueError(f"Hierarchy file not found: {hierarchy_path}")
+        hierarchy_paths.append(hierarchy_path)
+
+    with ThreadPoolExecutor(max_workers=workers or max(1, len(col_names))) as executor:
+        compiled = list(executor.map(compile_hierarchy, hierarchy_paths, col_names))
+
+    if dataset is not None:
+        for hierarchy in compiled:
+            if hierarchy.column not in dataset.columns:
+                raise ValueError(f"Column {hierarchy.column} does not exist in the dataset.")
+            hierarchy.validate_coverage(dataset[hierarchy.column])
+
+    return {hierarchy.column: hierarchy for hierarchy in compiled}
+
+
+def to_hierarchy_frame(hierarchies: Dict[str, CompiledHierarchy]) -> pd.DataFrame:
+    """
+    CompiledHierarchyをまとめて、Incognitoに渡す階層定義df (child_level == 0 の行) にする
+    """
+    return pd.concat(
+        [hierarchy.to_frame() for hierarchy in hierarchies.values()], ignore_index=True
+    )
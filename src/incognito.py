@@ -1,21 +1,124 @@
-from typing import List
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+import numpy as np
 import pandas as pd
 import queue
+import random
 import time
 
-from . import df_operations
+from . import df_operations, polars_operations
+from .array_lattice import ArrayLattice
+from .encoding import EncodedTable
+from .export import ExportPipeline
 from .lattice import Lattice
-from .utils import vprint
+from .utils import current_memory_bytes, peak_memory_bytes, vprint
+
+# Latticeの実装: "object" は Node オブジェクトのグラフ、"array" は NumPy配列によるCSR表現
+LATTICE_BACKENDS = {"object": Lattice, "array": ArrayLattice}
+
+# 一般化・グループ化の実装: df_operationsと同じインタフェースを持つモジュール
+BACKENDS = {"pandas": df_operations, "polars": polars_operations}
+
+# add_listenerで購読できるイベント
+EVENTS = ("iteration_start", "iteration_end", "node_evaluated", "node_pruned", "node_marked")
+
+# verifyのworkerプロセスが保持するEncodedTable
+_verify_table: Optional[EncodedTable] = None
+
+
+def _init_verify_worker(table: EncodedTable) -> None:
+    global _verify_table
+    _verify_table = table
+
+
+def _min_class_size(generalization: List[tuple], table: Optional[EncodedTable] = None) -> int:
+    """
+    一般化変換を適用したときの最小の同値クラスのサイズ
+    tableを省略した場合はworkerプロセスのEncodedTableを使う
+    """
+    sizes = (table or _verify_table).frequency_set(generalization)
+    return int(sizes.min()) if len(sizes) else 0
+
+
+def _frontier(generalizations: List[List[tuple]], kind: str) -> List[List[tuple]]:
+    """
+    一般化変換の集合から、極小 (minimal) または極大 (maximal) なものを取り出す
+    あるノードより全属性のレベルが低い（高い）ノードが他にあれば、そのノードは極小（極大）でない
+    """
+    if not generalizations:
+        return []
+    levels = np.array([[level for _, level in g] for g in generalizations])
+    if kind == "maximal":
+        levels = -levels
+    elif kind != "minimal":
+        raise ValueError(f"Unknown frontier: {kind}")
+    frontier = []
+    for i, generalization in enumerate(generalizations):
+        dominated = np.all(levels <= levels[i], axis=1) & np.any(levels < levels[i], axis=1)
+        if not dominated.any():
+            frontier.append(generalization)
+    return frontier
 
 
 class Incognito:
-    def __init__(self, T: pd.DataFrame, hierarchy: pd.DataFrame, k: int) -> None:
+    def __init__(
+        self,
+        T: pd.DataFrame,
+        hierarchy: pd.DataFrame,
+        k: int,
+        freq_cache: Optional[Dict[tuple, pd.Series]] = None,
+        lattice_backend: str = "object",
+        verbose: Optional[bool] = None,
+        weight_col: Optional[str] = None,
+        backend: str = "pandas",
+        plan: Optional[dict] = None,
+    ) -> None:
+        """
+        param T: 対象のテーブル
+        param hierarchy: 一般化階層の定義df (child_level == 0 の行)
+        param k: k-匿名性のk値
+        param freq_cache: 一般化変換 -> frequency set のキャッシュ。
+            同じTに対する複数回の実行で共有すると、評価済みノードの集計を再利用できる。
+            Noneのときはキャッシュしない
+        param lattice_backend: Latticeの実装 ("object" or "array")
+            準識別子が多くLatticeが大きい場合は "array" の方が省メモリかつ高速
+        param verbose: このインスタンスの詳細出力の有無。Noneのときはutils.VERBOSEに従う
+        param weight_col: Tの各行が表すレコード数の列（集計済みのテーブルの場合）。
+            Noneのときは各行を1レコードとして扱う
+        param backend: runでの一般化・グループ化の実装 ("pandas" or "polars")
+            "polars" はマルチスレッドで動作する。結果はどちらも同じ
+        param plan: planner.planによる実行前の見積もり。save_resultで実績値とともに保存する
+        """
+        if lattice_backend not in LATTICE_BACKENDS:
+            raise ValueError(f"Unknown lattice backend: {lattice_backend}")
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}")
         self.T: pd.DataFrame = T  # 対象のテーブル
         self.Q: List[str] = hierarchy["column"].unique().tolist()  # 準識別子のリスト
         self.hierarchy: pd.DataFrame = hierarchy  # 一般化階層の定義df
         self.k: int = k  # k-匿名性のk値
-        self.lattice: Lattice  # 構築済みのLattice
+        self.weight_col: Optional[str] = weight_col  # 各行が表すレコード数の列
+        self.backend: str = backend  # 一般化・グループ化の実装
+        # 準識別子の値の組み合わせごとにTをまとめたテーブル（runで構築、backendの形式）
+        self.T_collapsed = None
+        self._collapsed_weight_col: str = weight_col or df_operations.COUNT_COL
+        self.lattice_backend: str = lattice_backend  # Latticeの実装
+        self.lattice: Lattice | ArrayLattice  # 構築済みのLattice
         self.execution_time: float = None  # 実行時間
+        self.verification: Optional[dict] = None  # verifyの結果レポート
+        self.plan: Optional[dict] = plan  # planner.planの結果（metadata.jsonに保存）
+        self.iteration_stats: List[dict] = []  # runの属性数ごとの実績値
+        # runの開始時の常駐メモリと、run中の最大常駐メモリ（計測できない場合は None）
+        self.memory_before_run: Optional[int] = None
+        self.run_peak_memory: Optional[int] = None
+        self.verbose: Optional[bool] = verbose  # Noneのときはutils.VERBOSEに従う
+        # イベント名 -> コールバックのリスト
+        self.listeners: Dict[str, List[Callable[[str, dict], None]]] = {
+            event: [] for event in EVENTS
+        }
+        # 一般化変換 -> frequency set のキャッシュ（渡されたときのみ使う）
+        # 1回のrunでは同じノードを2度評価しないため、単独の実行ではキャッシュしない
+        self.freq_cache: Optional[Dict[tuple, pd.Series]] = freq_cache
 
     def run(self) -> List[List[tuple]]:
         """
@@ -23,85 +126,189 @@ class Incognito:
         return: 一般化されたDataFrame
         """
         start_time = time.perf_counter()
+        self.memory_before_run = current_memory_bytes()
+        process_peak_before = peak_memory_bytes()
 
-        self.lattice = Lattice(self.hierarchy)
+        self.lattice = LATTICE_BACKENDS[self.lattice_backend](
+            self.hierarchy, verbose=self.verbose
+        )
         # self.lattice.increment_attributes()  # initialization of the lattice
+        lattice = self.lattice
+        # 同じ準識別子の値を持つレコードを1行にまとめ、k匿名性は重みの和で判定する
+        self.T_collapsed = BACKENDS[self.backend].from_pandas(
+            df_operations.collapse(self.T, self.Q, self.weight_col), self.Q
+        )
+        self._vprint(f"Collapsed into {len(self.T_collapsed)} distinct records.")
         priority_queue = queue.PriorityQueue()
+        self.iteration_stats = []
 
         # 属性の組み合わせ数をボトムアップしていく
         for attributes in range(len(self.Q)):
-            vprint(f"Processing attributes: {attributes + 1} / {len(self.Q)}")
+            iteration_start = time.perf_counter()
+            self._vprint(f"Processing attributes: {attributes + 1} / {len(self.Q)}")
             # n-1 attributes の Lattice から n attributes のものに更新
-            self.lattice.increment_attributes()
-            vprint(
-                "Current lattice nodes:",
-                len([node for node in self.lattice.nodes if not node.deleted]),
-            )
+            lattice.increment_attributes()
+            num_nodes = lattice.num_active()
+            num_edges = lattice.num_edges()
+            self._vprint("Current lattice nodes:", num_nodes)
+            self._emit("iteration_start", iteration=attributes, num_nodes=num_nodes)
             # nodeの高さによる優先度付きqueue
-            for node in self.lattice.nodes:
+            for node in lattice.roots():
                 ## rootを流し込んで初期化
-                if node.is_root() and not node.deleted:
-                    priority_queue.put(node)
+                priority_queue.put((lattice.height(node), node))
 
-            vprint("pruning... ", end="")
+            self._vprint("pruning... ", end="")
             pruning_count = 0
+            evaluated_count = 0
+            max_frequency_set_size = 0
             while not priority_queue.empty():
-                node = priority_queue.get()
+                _, node = priority_queue.get()
 
                 # k匿名を満たすとしてマークされていたら、スキップ
-                if node.is_marked() or node.deleted:
+                if lattice.is_marked(node) or lattice.is_deleted(node):
                     continue
                 else:
                     # nodeに定義された一般化変換に従い、一般化を実施、k匿名性を検証
-                    # ノードの一般化変換を取得: level-0 -> level-n
-                    def row_match(row):
-                        # すべての(dim, level)条件を満たすか
-                        result = any(
-                            (row["column"] == dim)
-                            and (row["child_level"] == 0)
-                            and (row["parent_level"] == level)
-                            for (dim, level) in node.generalization
-                        )
-                        return result
-
-                    eval_generalization = self.hierarchy[
-                        self.hierarchy.apply(row_match, axis=1)
-                    ]
-                    # 一般化を適用
-                    generalized_df = df_operations.generalize(
-                        self.T, eval_generalization
+                    generalization = lattice.generalization(node)
+                    cached = (
+                        self.freq_cache is not None
+                        and tuple(generalization) in self.freq_cache
                     )
-
-                    # k匿名性の確認
-                    cols = [tup[0] for tup in node.generalization]
-                    k_anonymous = df_operations.is_k_anonymous(
-                        generalized_df, cols, self.k
+                    node_start = time.perf_counter()
+                    sizes = self._frequency_set(generalization)
+                    k_anonymous = all(size >= self.k for size in sizes)
+                    evaluated_count += 1
+                    max_frequency_set_size = max(max_frequency_set_size, len(sizes))
+                    self._emit(
+                        "node_evaluated",
+                        generalization=generalization,
+                        duration=time.perf_counter() - node_start,
+                        num_classes=len(sizes),
+                        k_anonymous=k_anonymous,
+                        cached=cached,
                     )
 
                     # k匿名性を満たすなら、ノードとその直親をマーク
                     if k_anonymous:
-                        node.mark()
-                        for dst_node in node.to_nodes:
-                            dst_node.mark()
+                        lattice.mark(node)
+                        self._emit("node_marked", generalization=generalization, evaluated=True)
+                        for dst_node in lattice.successors(node):
+                            lattice.mark(dst_node)
+                            if self.listeners["node_marked"]:
+                                self._emit(
+                                    "node_marked",
+                                    generalization=lattice.generalization(dst_node),
+                                    evaluated=False,
+                                )
 
                     # k匿名でないとき、一段上のノードを優先度付きqueueに追加
                     else:
-                        for dst_node in node.to_nodes:
-                            priority_queue.put(dst_node)
-                        node.delete()
+                        for dst_node in lattice.successors(node):
+                            priority_queue.put((lattice.height(dst_node), dst_node))
+                        lattice.delete(node)
                         pruning_count += 1
-            vprint(f"{pruning_count} nodes are pruned.")
+                        self._emit("node_pruned", generalization=generalization)
+            self._vprint(f"{pruning_count} nodes are pruned.")
+            self.iteration_stats.append(
+                {
+                    "num_attributes": attributes + 1,
+                    "num_nodes": num_nodes,
+                    "num_edges": num_edges,
+                    "num_evaluated": evaluated_count,
+                    "num_pruned": pruning_count,
+                    "max_frequency_set_size": max_frequency_set_size,
+                    "duration": time.perf_counter() - iteration_start,
+                }
+            )
+            self._emit(
+                "iteration_end",
+                iteration=attributes,
+                num_nodes=num_nodes,
+                num_evaluated=evaluated_count,
+                num_pruned=pruning_count,
+                duration=time.perf_counter() - iteration_start,
+            )
 
         result_generalizations = [
-            sorted(node.generalization, key=lambda x: x[0])
-            for node in self.lattice.nodes
-            if not node.deleted
+            lattice.generalization(node) for node in lattice.active_nodes()
         ]
 
         self.execution_time = time.perf_counter() - start_time
+        # プロセスの最大常駐メモリはrun以前の実行も含むため、run中に更新された場合のみ
+        # runのピークとして記録する（更新されなければrun中のピークは以前の最大値以下で、不明）
+        process_peak_after = peak_memory_bytes()
+        self.run_peak_memory = (
+            process_peak_after
+            if process_peak_before is not None and process_peak_after > process_peak_before
+            else None
+        )
 
         return result_generalizations
 
+    def num_records(self) -> int:
+        """
+        Tが表すレコード数（weight_colが指定されている場合は重みの和）
+        """
+        if self.weight_col is None:
+            return len(self.T)
+        return int(self.T[self.weight_col].sum())
+
+    def add_listener(self, event: str, callback: Callable[[str, dict], None]) -> None:
+        """
+        runの実行中に発生するイベントのコールバックを登録する
+        param event: イベント名 (EVENTS のいずれか)
+        param callback: callback(event, data) の形で呼ばれる。dataの内容:
+            iteration_start: iteration, num_nodes
+            iteration_end: iteration, num_nodes, num_evaluated, num_pruned, duration
+            node_evaluated: generalization, duration, num_classes, k_anonymous, cached
+            node_pruned: generalization
+            node_marked: generalization, evaluated (Falseなら直前に評価したノードからのマーク)
+        """
+        if event not in self.listeners:
+            raise ValueError(f"Unknown event: {event}")
+        self.listeners[event].append(callback)
+
+    def _emit(self, event: str, **data) -> None:
+        for callback in self.listeners[event]:
+            callback(event, data)
+
+    def _vprint(self, *args, **kwargs) -> None:
+        vprint(*args, verbose=self.verbose, **kwargs)
+
+    def _frequency_set(self, generalization: List[tuple]) -> pd.Series:
+        """
+        一般化変換を適用したTの frequency set を求める（freq_cacheにあれば再利用）
+        Tを準識別子の値の組み合わせごとにまとめたT_collapsedを一般化し、重みの和で集計する
+        param generalization: 一般化変換 [(column, level), ...]
+        return: 同値クラスごとのレコード数
+        """
+        key = tuple(sorted(generalization, key=lambda x: x[0]))
+        sizes = self.freq_cache.get(key) if self.freq_cache is not None else None
+        if sizes is None:
+            # ノードの一般化変換を取得: level-0 -> level-n
+            def row_match(row):
+                # すべての(dim, level)条件を満たすか
+                return any(
+                    (row["column"] == dim)
+                    and (row["child_level"] == 0)
+                    and (row["parent_level"] == level)
+                    for (dim, level) in generalization
+                )
+
+            eval_generalization = self.hierarchy[
+                self.hierarchy.apply(row_match, axis=1)
+            ]
+            # 一般化を適用
+            operations = BACKENDS[self.backend]
+            generalized_df = operations.generalize(self.T_collapsed, eval_generalization)
+            cols = [tup[0] for tup in key]
+            sizes = operations.frequency_set(
+                generalized_df, cols, self._collapsed_weight_col
+            )
+            if self.freq_cache is not None:
+                self.freq_cache[key] = sizes
+        return sizes
+
     def get_result(self) -> dict:
         """
         Incognitoの結果を取得
@@ -112,10 +319,16 @@ class Incognito:
                 ...
             }
         """
+        return dict(self.iter_result())
+
+    def iter_result(self) -> Iterator[tuple]:
+        """
+        Incognitoの結果を一般化変換ごとに順に生成する（全件をメモリ上に保持しない）
+        return: (一般化変換のtuple, 一般化したDataFrame) のiterator
+        """
         generalizations = [
-            node.generalization for node in self.lattice.nodes if not node.deleted
+            self.lattice.generalization(node) for node in self.lattice.active_nodes()
         ]
-        result = {}
 
         for generalization in generalizations:
 
@@ -134,9 +347,7 @@ class Incognito:
             # 一般化変換
             generalized_df = df_operations.generalize(self.T, generalize_hierarchy)
 
-            result[tuple(sorted(generalization, key=lambda x: x[0]))] = generalized_df
-
-        return result
+            yield tuple(sorted(generalization, key=lambda x: x[0])), generalized_df
 
     def print_result(self) -> None:
         """
@@ -144,7 +355,7 @@ class Incognito:
         """
         print(f"\nIncognito result:")
         lattice_result = [
-            node.generalization for node in self.lattice.nodes if not node.deleted
+            self.lattice.generalization(node) for node in self.lattice.active_nodes()
         ]
         print(
             f"There are {len(lattice_result)} combinations of generalization levels satisfying k-anonymity (k={self.k}):"
@@ -160,8 +371,10 @@ class Incognito:
         return: 検証結果 (True: 正常, False: 異常)
         """
         print("Verifying Incognito result...")
-        result = [node for node in self.lattice.nodes if not node.deleted]
-        for node in result:
+        result = [
+            self.lattice.generalization(node) for node in self.lattice.active_nodes()
+        ]
+        for generalization in result:
             # conditions = self._node_to_generalization_tuples(node, self.hierarchies)
 
             # ノードの一般化変換を取得
@@ -170,7 +383,7 @@ class Incognito:
                     (row["column"] == dim)
                     and (row["child_level"] == 0)
                     and (row["parent_level"] == level)
-                    for (dim, level) in node.generalization
+                    for (dim, level) in generalization
                 )
 
             generalize_hierarchy = self.hierarchy[
@@ -186,25 +399,98 @@ class Incognito:
             #     for i in range(1, num_dims + 1)
             # ]
             # print(f"node: {', '.join(conditions_tup)}")
-            vprint(
-                generalized_df.groupby(
-                    [tup[0] for tup in node.generalization], dropna=False
-                ).size()
+            self._vprint(
+                df_operations.frequency_set(
+                    generalized_df, [tup[0] for tup in generalization], self.weight_col
+                )
             )
             if not df_operations.is_k_anonymous(
-                generalized_df, [tup[0] for tup in node.generalization], self.k
+                generalized_df,
+                [tup[0] for tup in generalization],
+                self.k,
+                weight_col=self.weight_col,
             ):
                 print(
-                    f"{node.generalization} -does not satisfy k-anonymity (k={self.k})."
+                    f"{generalization} -does not satisfy k-anonymity (k={self.k})."
                 )
                 return False
 
         print(f"All {len(result)} nodes satisfies k-anonymity (k={self.k}).")
         return True
 
-    def save_result(self, output_dir: str) -> None:
+    def verify(
+        self,
+        workers: Optional[int] = None,
+        sample: Optional[int] = None,
+        frontier: Optional[str] = None,
+        seed: Optional[int] = None,
+    ) -> dict:
+        """
+        処理後の結果を、整数コード化した準識別子列を用いて高速に検証する
+        param workers: 検証に使うプロセス数 (None or 1: 逐次実行)
+        param sample: 検証するノード数の上限。指定された場合はランダムに抽出する
+        param frontier: "minimal" or "maximal" を指定すると、極小または極大なノードのみ検証する
+            k匿名性は一般化について単調なので、極小ノードが全てk匿名なら全ノードがk匿名
+        param seed: sampleの乱数シード
+        return: 検証結果のレポート
+        """
+        start_time = time.perf_counter()
+        result = [
+            self.lattice.generalization(node) for node in self.lattice.active_nodes()
+        ]
+
+        targets = result
+        if frontier is not None:
+            targets = _frontier(targets, frontier)
+        if sample is not None and sample < len(targets):
+            targets = random.Random(seed).sample(targets, sample)
+
+        table = EncodedTable(self.T, self.hierarchy, self.weight_col)
+        if workers is None or workers <= 1:
+            min_sizes = [
+                _min_class_size(generalization, table) for generalization in targets
+            ]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_verify_worker,
+                initargs=(table,),
+            ) as executor:
+                min_sizes = list(executor.map(_min_class_size, targets))
+
+        failures = [
+            {"generalization": dict(generalization), "min_class_size": min_size}
+            for generalization, min_size in zip(targets, min_sizes)
+            if min_size < self.k
+        ]
+        report = {
+            "ok": len(failures) == 0,
+            "k": self.k,
+            "num_nodes": len(result),
+            "num_verified": len(targets),
+            "frontier": frontier,
+            "sample": sample,
+            "min_class_size": min(min_sizes) if min_sizes else None,
+            "failures": failures,
+            "execution_time": time.perf_counter() - start_time,
+        }
+        self.verification = report
+        return report
+
+    def save_result(
+        self,
+        output_dir: str,
+        compression: Optional[str] = None,
+        workers: int = 4,
+        max_pending: int = 4,
+    ) -> None:
         """
         Incognito実行結果を保存
+        一般化済みテーブルの生成と書き出しは ExportPipeline で並行して行う
+
+        param compression: CSVの圧縮方式 (None, "gzip" or "zstd")
+        param workers: 書き出しスレッド数
+        param max_pending: 書き出し待ちのテーブル数の上限（メモリ使用量の上限）
 
         出力構造:
         output_dir/
@@ -217,6 +503,7 @@ class Incognito:
         from pathlib import Path
         from datetime import datetime
         import json
+        import os
 
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
@@ -225,26 +512,23 @@ class Incognito:
         gen_dir = output_path / "generalizations"
         gen_dir.mkdir(exist_ok=True)
 
-        result = self.get_result()
-
-        if not result:
-            print("Warning: No valid generalizations found. Saving metadata only.")
-            valid_generalizations = []
-            generalizations_metadata = []
-        else:
-            valid_generalizations = list(result.keys())
-            generalizations_metadata = []
-
+        generalizations_metadata = []
+        pipeline = ExportPipeline(
+            gen_dir,
+            output_path / ".staging",
+            compression=compression,
+            workers=workers,
+            max_pending=max_pending,
+        )
+        with pipeline:
             # 各一般化を保存
-            for gen_tuple in valid_generalizations:
+            for gen_tuple, gen_df in self.iter_result():
                 # ファイル名生成: sex0_workclass2.csv のような形式
                 filename_parts = [f"{col}{level}" for col, level in sorted(gen_tuple, key=lambda x: x[0])]
-                filename = "_".join(filename_parts) + ".csv"
-                csv_path = gen_dir / filename
+                filename = pipeline.filename("_".join(filename_parts))
 
-                # データ保存
-                gen_df = result[gen_tuple]
-                gen_df.to_csv(csv_path, index=False)
+                # データ保存（書き出しは別スレッド）
+                pipeline.submit(filename, gen_df)
 
                 # メタデータに記録
                 height = sum(level for _, level in gen_tuple)
@@ -254,22 +538,40 @@ class Incognito:
                     "height": height
                 })
 
-            print(f"{len(valid_generalizations)} generalizations saved to {gen_dir}")
+        if not generalizations_metadata:
+            print("Warning: No valid generalizations found. Saving metadata only.")
+        else:
+            print(f"{len(generalizations_metadata)} generalizations saved to {gen_dir}")
 
         # メタデータ作成
         metadata = {
             "algorithm": "Incognito",
             "k": self.k,
             "quasi_identifiers": self.Q,
-            "num_valid_generalizations": len(valid_generalizations),
+            "num_valid_generalizations": len(generalizations_metadata),
             "generalizations": sorted(generalizations_metadata, key=lambda x: x["height"]),
+            "compression": compression,
             "execution_time": self.execution_time,
-            "num_records": len(self.T),
+            "num_records": self.num_records(),
             "timestamp": datetime.now().isoformat()
         }
+        # 実績値（planの見積もりと比較できるよう、同じ単位で記録する）
+        metadata["actual"] = {
+            "num_distinct_records": len(self.T_collapsed) if self.T_collapsed is not None else None,
+            "iterations": self.iteration_stats,
+            "memory_before_run_bytes": self.memory_before_run,
+            "run_peak_memory_bytes": self.run_peak_memory,
+            "process_peak_memory_bytes": peak_memory_bytes(),
+        }
+        if self.plan is not None:
+            metadata["plan"] = self.plan
+        if self.verification is not None:
+            metadata["verification"] = self.verification
 
         metadata_path = output_path / "metadata.json"
-        with open(metadata_path, "w", encoding="utf-8") as f:
+        tmp_path = output_path / ".metadata.json.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
             json.dump(metadata, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, metadata_path)
         print(f"Metadata saved to: {metadata_path}")
         print(f"\nAll results saved to: {output_path.absolute()}")
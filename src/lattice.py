@@ -1,13 +1,13 @@
 import pandas as pd
 import itertools
-from typing import List
+from typing import List, Optional
 
 from .node import Node
 from .utils import vprint
 
 
 class Lattice:
-    def __init__(self, hierarchy: pd.DataFrame) -> None:
+    def __init__(self, hierarchy: pd.DataFrame, verbose: Optional[bool] = None) -> None:
         """
         Q: 準識別子のリスト
         """
@@ -15,6 +15,8 @@ class Lattice:
         self.Q: List[str] = hierarchy["column"].unique().tolist()
         self.hierarchy: pd.DataFrame = hierarchy
         self.attributes: int = 0
+        self.verbose: Optional[bool] = verbose  # Noneのときはutils.VERBOSEに従う
+        self._index: dict = {}  # id(node) -> self.nodes上のインデックス
 
     def _single_attribute_initialization(self) -> None:
         """
@@ -64,7 +66,7 @@ class Lattice:
                 append_node.add_inclement_parent([p, q])
                 new_nodes_tmp.append(append_node)
 
-        vprint(len(new_nodes_tmp), "nodes generated.")
+        vprint(len(new_nodes_tmp), "nodes generated.", verbose=self.verbose)
         self.nodes = new_nodes_tmp
 
     def _edge_generation(self) -> None:
@@ -133,9 +135,9 @@ class Lattice:
         """
         属性を+1したLatticeを生成する
         """
-        vprint("node_generation: ", end="")
+        vprint("node_generation: ", end="", verbose=self.verbose)
         self._node_generation()
-        vprint("edge_generation")
+        vprint("edge_generation", verbose=self.verbose)
         self._edge_generation()
         self.attributes += 1
 
@@ -148,3 +150,61 @@ class Lattice:
         else:
             self.graph_generation()
         self.attributes += 1
+        self._index = {id(node): i for i, node in enumerate(self.nodes)}
+
+    # 以下、ノードをインデックスで扱うインタフェース（ArrayLatticeと共通）
+
+    def num_active(self) -> int:
+        """
+        削除されていないノード数
+        """
+        return len(self.active_nodes())
+
+    def active_nodes(self) -> List[int]:
+        """
+        削除されていないノードのインデックス
+        """
+        return [i for i, node in enumerate(self.nodes) if not node.deleted]
+
+    def num_edges(self) -> int:
+        """
+        エッジ数
+        """
+        return sum(len(node.to_nodes) for node in self.nodes)
+
+    def roots(self) -> List[int]:
+        """
+        削除されていないrootノードのインデックス
+        """
+        return [
+            i
+            for i, node in enumerate(self.nodes)
+            if node.is_root() and not node.deleted
+        ]
+
+    def height(self, i: int) -> int:
+        return self.nodes[i].height
+
+    def generalization(self, i: int) -> List[tuple]:
+        """
+        ノードiの一般化変換 [(column, level), ...]（属性名順）
+        """
+        return sorted(self.nodes[i].generalization, key=lambda x: x[0])
+
+    def successors(self, i: int) -> List[int]:
+        """
+        ノードiから出るエッジの遷移先ノードのインデックス
+        """
+        return [self._index[id(dst_node)] for dst_node in self.nodes[i].to_nodes]
+
+    def is_marked(self, i: int) -> bool:
+        return self.nodes[i].is_marked()
+
+    def is_deleted(self, i: int) -> bool:
+        return self.nodes[i].deleted
+
+    def mark(self, i: int) -> None:
+        self.nodes[i].mark()
+
+    def delete(self, i: int) -> None:
+        self.nodes[i].delete()
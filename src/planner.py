@@ -0,0 +1,215 @@
+"""
+Lattice-size estimator and memory planner
+
+Estimates, before running Incognito, how large the lattice and the frequency sets
+can become from the hierarchy heights and the distinct value counts of the data,
+and chooses the lattice backend, the grouping backend and the number of worker
+processes that fit in a memory budget.
+
+All figures are upper bounds for a run without pruning: iteration i holds every
+generalization of every i-attribute subset of the quasi-identifiers. The peak
+memory starts from the current resident memory of the process at planning time
+(the interpreter, the libraries and the loaded dataset); where that cannot be
+read, the process peak so far is used instead.
+"""
+
+import os
+from typing import List, Optional
+
+import pandas as pd
+
+from . import df_operations
+from .utils import current_memory_bytes, peak_memory_bytes
+from .encoding import EncodedTable
+
+# 見積もりに使う1要素あたりのバイト数（概算）
+OBJECT_NODE_BYTES = 1000  # Node オブジェクトと generalization のリスト・タプル
+OBJECT_EDGE_BYTES = 16  # to_nodes / from_nodes の参照
+ARRAY_EDGE_BYTES = 8 * 4  # indices と、構築時の (src, dst) の一時配列
+FREQ_ENTRY_BYTES = 16  # frequency set の1クラスあたり（値 + インデックスのコード）
+
+# 予算の指定がないとき、arrayのLatticeに切り替えるノード数
+ARRAY_LATTICE_NODES = 100_000
+# polarsに切り替える重複除去後のレコード数
+POLARS_RECORDS = 1_000_000
+
+
+def _polars_available() -> bool:
+    try:
+        import polars  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def lattice_sizes(heights: List[int]) -> List[dict]:
+    """
+    属性数ごとのLatticeのノード数・エッジ数の上限
+    属性集合Sのノード数は prod(h+1)、エッジ数は sum_c h_c * prod_{c'!=c}(h_c'+1)
+    これを大きさiの全ての部分集合について足し合わせる
+
+    param heights: 各準識別子の階層の高さ（最大の一般化レベル）
+    return: [{"num_attributes", "num_nodes", "num_edges"}, ...]
+    """
+    nodes = [1] + [0] * len(heights)
+    edges = [0] * (len(heights) + 1)
+    for height in heights:
+        for i in range(len(heights), 0, -1):
+            edges[i] += edges[i - 1] * (height + 1) + nodes[i - 1] * height
+            nodes[i] += nodes[i - 1] * (height + 1)
+    return [
+        {"num_attributes": i, "num_nodes": nodes[i], "num_edges": edges[i]}
+        for i in range(1, len(heights) + 1)
+    ]
+
+
+def plan(
+    T: pd.DataFrame,
+    hierarchy: pd.DataFrame,
+    memory_budget: Optional[int] = None,
+    weight_col: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> dict:
+    """
+    実行前に、Latticeの大きさ・frequency setの大きさ・メモリ使用量を見積もり、
+    メモリ予算に収まる実行方法を選ぶ
+
+    param T: 対象のテーブル
+    param hierarchy: 一般化階層の定義df (child_level == 0 の行)
+    param memory_budget: メモリ予算 [bytes]。Noneのときは予算による制約なし
+    param weight_col: Tの各行が表すレコード数の列
+    param max_workers: 並列数の上限（デフォルト: CPU数）
+    return: 見積もりと選んだ実行方法のdict（metadata.jsonに保存できる形式）
+    """
+    # 読み込み済みのデータセットとインタプリタ・ライブラリの分（Tを含む）
+    # 現在の常駐メモリが取れない環境では、起動からの最大常駐メモリで代用する（大きめになる）
+    process_bytes = current_memory_bytes()
+    if process_bytes is None:
+        process_bytes = peak_memory_bytes()
+    table = EncodedTable(T, hierarchy, weight_col)
+    Q = table.Q
+    heights = [len(table.level_sizes[col]) - 1 for col in Q]
+    num_distinct = len(df_operations.collapse(T, Q, weight_col))
+
+    # 属性数ごとのLatticeの大きさと、frequency setの大きさの上限
+    # frequency setが最大になるのは全属性がlevel-0のrootノードで、その大きさは
+    # 重複除去後のレコード数と、値の種類数が多い方からi属性分の積の小さい方
+    distinct_counts = sorted((table.level_sizes[col][0] for col in Q), reverse=True)
+    iterations = lattice_sizes(heights)
+    product = 1
+    for iteration, distinct_count in zip(iterations, distinct_counts):
+        product *= distinct_count
+        iteration["max_frequency_set_size"] = min(num_distinct, product)
+
+    # メモリ使用量の見積もり（直前の属性数のLatticeと同時に保持する）
+    data_bytes = int(T.memory_usage(deep=True).sum())
+    collapsed_bytes = int(data_bytes / max(len(T), 1) * num_distinct) + 8 * num_distinct
+    encoded_bytes = 8 * len(T) * (len(Q) + 1)
+
+    def lattice_bytes(iteration: dict, backend: str) -> int:
+        if backend == "object":
+            return (
+                OBJECT_NODE_BYTES * iteration["num_nodes"]
+                + OBJECT_EDGE_BYTES * 2 * iteration["num_edges"]
+            )
+        return (
+            iteration["num_nodes"] * (len(Q) + 4 + 2)
+            + ARRAY_EDGE_BYTES * iteration["num_edges"]
+        )
+
+    def peak_lattice_bytes(backend: str) -> int:
+        sizes = [lattice_bytes(iteration, backend) for iteration in iterations]
+        return max(
+            (size + (sizes[i - 1] if i > 0 else 0) for i, size in enumerate(sizes)),
+            default=0,
+        )
+
+    # frequency setのキャッシュ: 評価した全ノードの集計を保持した場合の上限
+    # Incognitoはfreq_cacheを渡されたとき（サービス・バッチで共有する場合）のみキャッシュする
+    freq_cache_bytes = sum(
+        FREQ_ENTRY_BYTES
+        * iteration["num_attributes"]
+        * iteration["num_nodes"]
+        * iteration["max_frequency_set_size"]
+        for iteration in iterations
+    )
+    # 1ノードの評価で一時的に使うメモリ（一般化したテーブルと集計）
+    evaluation_bytes = 2 * collapsed_bytes
+    base_bytes = (
+        process_bytes if process_bytes is not None else data_bytes
+    ) + collapsed_bytes + evaluation_bytes
+
+    # Latticeの実装の選択: 予算内ならNodeオブジェクト、収まらない・大きすぎる場合はarray
+    total_nodes = sum(iteration["num_nodes"] for iteration in iterations)
+    lattice_backend = "object"
+    if total_nodes > ARRAY_LATTICE_NODES:
+        lattice_backend = "array"
+    elif memory_budget is not None and (
+        base_bytes + peak_lattice_bytes("object") > memory_budget
+    ):
+        lattice_backend = "array"
+
+    # 一般化・グループ化の実装の選択
+    backend = "pandas"
+    if num_distinct > POLARS_RECORDS and _polars_available():
+        backend = "polars"
+
+    # 単独の実行ではfrequency setを保持しないので、ピークはLatticeと評価中のテーブルで決まる
+    peak_bytes = base_bytes + peak_lattice_bytes(lattice_backend)
+
+    # 並列数の選択: 検証の各workerはEncodedTableを1つずつ持つ
+    cpu_count = max_workers or os.cpu_count() or 1
+    workers = cpu_count
+    if memory_budget is not None:
+        spare = memory_budget - peak_bytes
+        workers = max(1, min(cpu_count, spare // max(encoded_bytes, 1)))
+
+    return {
+        "quasi_identifiers": Q,
+        "heights": dict(zip(Q, heights)),
+        "distinct_values": {col: table.level_sizes[col][0] for col in Q},
+        "num_records": len(T),
+        "num_distinct_records": num_distinct,
+        "iterations": iterations,
+        "total_nodes": total_nodes,
+        "memory": {
+            "process_bytes": process_bytes,
+            "data_bytes": data_bytes,
+            "collapsed_bytes": collapsed_bytes,
+            "evaluation_bytes": evaluation_bytes,
+            "lattice_bytes": {
+                "object": peak_lattice_bytes("object"),
+                "array": peak_lattice_bytes("array"),
+            },
+            "freq_cache_bytes_upper_bound": freq_cache_bytes,
+            "estimated_peak_bytes": peak_bytes,
+        },
+        "memory_budget": memory_budget,
+        "fits_in_budget": memory_budget is None or peak_bytes <= memory_budget,
+        "lattice_backend": lattice_backend,
+        "backend": backend,
+        "workers": int(workers),
+    }
+
+
+def print_plan(plan: dict) -> None:
+    """
+    planの内容を表示する
+    """
+    print("Incognito plan:")
+    print(f"  quasi-identifiers: {plan['quasi_identifiers']}")
+    print(f"  records: {plan['num_records']} ({plan['num_distinct_records']} distinct)")
+    for iteration in plan["iterations"]:
+        print(
+            f"  attributes {iteration['num_attributes']}: "
+            f"<= {iteration['num_nodes']} nodes, <= {iteration['num_edges']} edges, "
+            f"frequency set <= {iteration['max_frequency_set_size']} classes"
+        )
+    memory = plan["memory"]
+    print(f"  estimated peak memory: {memory['estimated_peak_bytes'] / 2**20:.1f} MiB")
+    if plan["memory_budget"] is not None:
+        print(f"  memory budget: {plan['memory_budget'] / 2**20:.1f} MiB")
+    print(
+        f"  chosen: lattice={plan['lattice_backend']}, backend={plan['backend']}, "
+        f"workers={plan['workers']}"
+    )
@@ -0,0 +1,139 @@
+"""
+Polars implementation of the df_operations interface
+
+generalize / is_k_anonymous / frequency_set take a polars DataFrame converted with
+from_pandas and run multi-threaded inside Polars. Columns keep their dtypes and
+hierarchy values are cast to them, so class sizes are identical to the pandas
+implementation.
+Requires the optional dependency polars (`uv pip install polars`).
+"""
+
+from typing import List, Optional
+
+import pandas as pd
+
+try:
+    import polars as pl
+except ImportError:  # polars is optional
+    pl = None
+
+
+def _require_polars() -> None:
+    if pl is None:
+        raise ImportError(
+            "The polars backend requires polars. Install it with `uv pip install polars`."
+        )
+
+
+def from_pandas(df: pd.DataFrame, target_cols: List[str]) -> "pl.DataFrame":
+    """
+    pandasのDataFrameをpolarsに変換する
+    列のdtypeはそのまま保ち（NaNはnull）、generalizeで階層定義の値を列のdtypeに合わせる
+    型の混在したobject列のみ、polarsで扱えるよう文字列にする
+
+    df: Input DataFrame
+    target_cols: Quasi-identifier columns.
+    return: polars DataFrame
+    """
+    _require_polars()
+    mixed_cols = [
+        col
+        for col in target_cols
+        if df[col].dtype == object
+        and pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty")
+    ]
+    if mixed_cols:
+        df = df.copy()
+        for col in mixed_cols:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return pl.from_pandas(df)
+
+
+def _mapping(hierarchy_df: pd.DataFrame, col: str, dtype: "pl.DataType") -> tuple:
+    """
+    col の一般化規則 (child -> parent) を、child を列のdtypeに変換して返す
+    parent も列のdtypeに変換できる場合はdtypeを保ち、できなければ文字列とする
+    return: (child, parent, 一般化後の列のdtype)
+    """
+    mapping = hierarchy_df[hierarchy_df["column"] == col]
+    # 元の値から変換する（例: 列がfloat (NaNを含む) で階層定義がint のとき、20 -> 20.0）
+    child = pl.Series(mapping["child"].tolist(), strict=False).cast(dtype, strict=False)
+    try:
+        parent = pl.Series(mapping["parent"].tolist(), strict=False).cast(dtype)
+        return_dtype = dtype
+    except pl.exceptions.PolarsError:
+        parent = pl.Series(mapping["parent"].astype(str).tolist())
+        return_dtype = pl.Utf8
+    # 変換できないchildはデータに現れないので除き、childの重複は最初の規則を使う
+    rules = (
+        pl.DataFrame({"child": child, "parent": parent})
+        .filter(pl.col("child").is_not_null())
+        .unique(subset="child", keep="first", maintain_order=True)
+    )
+    return rules["child"], rules["parent"], return_dtype
+
+
+def generalize(df: "pl.DataFrame", hierarchy_df: pd.DataFrame) -> "pl.DataFrame":
+    """
+    Generalize the DataFrame based on the provided hierarchy.
+
+    df: Input polars DataFrame converted with from_pandas.
+    hierarchy_df: DataFrame containing the hierarchy mapping (same format as df_operations.generalize).
+    return: Generalized polars DataFrame.
+    """
+    _require_polars()
+    exprs = []
+    # 各カラムについて、hierarchy_dfによる一般化（対応のない値はそのまま）
+    for generalize_col in hierarchy_df["column"].unique():
+        child, parent, return_dtype = _mapping(
+            hierarchy_df, generalize_col, df.schema[generalize_col]
+        )
+        exprs.append(
+            pl.col(generalize_col).replace_strict(
+                child,
+                parent,
+                default=pl.col(generalize_col).cast(return_dtype),
+                return_dtype=return_dtype,
+            )
+        )
+    return df.with_columns(exprs)
+
+
+def is_k_anonymous(
+    df: "pl.DataFrame",
+    target_cols: List[str],
+    k: int,
+    debug: bool = False,
+    weight_col: Optional[str] = None,
+) -> bool:
+    """
+    dfがtarget_colsにおいてk-匿名であるか確認する
+
+    df: Input polars DataFrame
+    target_cols: List of columns to check for k-anonymity.
+    k: The value of k for k-anonymity.
+    weight_col: Column holding the number of records each row represents. If None, each row counts as one record.
+    return: True if the DataFrame is k-anonymous, False otherwise.
+    """
+    sizes = frequency_set(df, target_cols, weight_col)
+    if debug:
+        print(sizes)
+    return len(sizes) == 0 or sizes.min() >= k
+
+
+def frequency_set(
+    df: "pl.DataFrame", target_cols: List[str], weight_col: Optional[str] = None
+) -> "pl.Series":
+    """
+    dfのtarget_colsにおける frequency set（同値クラスごとのレコード数）を求める
+
+    df: Input polars DataFrame
+    target_cols: List of columns which define the equivalence classes.
+    weight_col: Column holding the number of records each row represents. If None, each row counts as one record.
+    return: Series of class sizes.
+    """
+    _require_polars()
+    grouped = df.group_by(target_cols)
+    if weight_col is None:
+        return grouped.len()["len"]
+    return grouped.agg(pl.col(weight_col).sum())[weight_col]
@@ -0,0 +1,90 @@
+import cProfile
+import io
+import json
+import pstats
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from .incognito import Incognito
+
+
+class RunProfiler:
+    """
+    Incognito.run をcProfileで計測し、ノードごとの評価時間を記録する
+
+    save() で出力ディレクトリに以下を保存する:
+        profile.prof: cProfileの生データ (snakeviz等で閲覧可能)
+        profile.txt: 累積時間順の統計
+        node_costs.json: ノードの評価時間のヒストグラムと、評価時間の長いノード
+    """
+
+    def __init__(self, incognito: Incognito, top: int = 20) -> None:
+        """
+        param incognito: 計測対象のIncognito
+        param top: node_costs.json に記録する評価時間の長いノードの数
+        """
+        self.incognito: Incognito = incognito
+        self.top: int = top
+        self.profile: cProfile.Profile = cProfile.Profile()
+        self.node_costs: List[dict] = []
+        incognito.add_listener("node_evaluated", self._on_node_evaluated)
+
+    def _on_node_evaluated(self, event: str, data: dict) -> None:
+        self.node_costs.append(
+            {
+                "generalization": dict(data["generalization"]),
+                "duration": data["duration"],
+                "num_classes": data["num_classes"],
+                "cached": data["cached"],
+            }
+        )
+
+    def run(self) -> List[List[tuple]]:
+        """
+        cProfileの下でIncognito.runを実行する
+        """
+        return self.profile.runcall(self.incognito.run)
+
+    def node_cost_histogram(self) -> dict:
+        """
+        ノードの評価時間のヒストグラム（対数スケールのビン）
+        """
+        durations = np.array([cost["duration"] for cost in self.node_costs])
+        if len(durations) == 0:
+            return {"bin_edges": [], "counts": []}
+        low = np.floor(np.log10(max(durations.min(), 1e-7)))
+        high = np.ceil(np.log10(max(durations.max(), 1e-7))) + 1
+        bin_edges = np.logspace(low, high, num=int(high - low) * 2 + 1)
+        counts, _ = np.histogram(durations, bins=bin_edges)
+        return {"bin_edges": bin_edges.tolist(), "counts": counts.tolist()}
+
+    def save(self, output_dir: str) -> None:
+        """
+        計測結果を output_dir に保存する（metadata.json と同じディレクトリ）
+        """
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+
+        self.profile.dump_stats(output_path / "profile.prof")
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats()
+        with open(output_path / "profile.txt", "w", encoding="utf-8") as f:
+            f.write(stream.getvalue())
+
+        durations = [cost["duration"] for cost in self.node_costs]
+        node_costs = {
+            "num_evaluated": len(self.node_costs),
+            "num_cached": sum(cost["cached"] for cost in self.node_costs),
+            "total_duration": sum(durations),
+            "mean_duration": sum(durations) / len(durations) if durations else None,
+            "histogram": self.node_cost_histogram(),
+            "slowest_nodes": sorted(
+                self.node_costs, key=lambda cost: cost["duration"], reverse=True
+            )[: self.top],
+        }
+        with open(output_path / "node_costs.json", "w", encoding="utf-8") as f:
+            json.dump(node_costs, f, indent=2, ensure_ascii=False)
+        print(f"Profile saved to: {output_path / 'profile.txt'}")
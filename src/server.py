@@ -0,0 +1,403 @@
+"""
+Long-running Incognito service
+
+Datasets and hierarchies are loaded once and kept in memory together with the
+frequency sets computed by previous jobs, so repeated jobs on the same dataset
+skip interpreter startup, CSV parsing and already evaluated lattice nodes.
+
+Protocol: JSON over HTTP, served on localhost TCP or on a Unix domain socket.
+
+    POST /run     {"dataset": "adult", "q_cols": [...], "k": 10,
+                   "dropna": false, "size_limit": null, "output": null}
+    POST /evict   {"dataset": null, "frequency_sets_only": false}
+                  unload a dataset (or all datasets if null), or only clear its
+                  cached frequency sets
+    GET  /status  loaded datasets and running jobs
+
+Each dataset keeps at most max_frequency_sets frequency sets; the least recently
+used ones are evicted first.
+"""
+
+import http.client
+import json
+import os
+import socket
+import socketserver
+import stat
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from . import utils
+from .hierarchy import compile_hierarchies_by_col_names, to_hierarchy_frame
+from .incognito import Incognito
+from .utils import vprint
+
+# データセットごとに保持するfrequency setの数の上限（デフォルト）
+MAX_FREQUENCY_SETS = 100_000
+
+
+class FrequencySetCache:
+    """
+    件数に上限のある frequency set のキャッシュ (LRU)
+    Incognitoのfreq_cacheとして渡せるよう、get / in / [] = を提供する
+    同時に実行されるジョブから共有されるため、操作はロックで保護する
+    """
+
+    def __init__(self, max_entries: int = MAX_FREQUENCY_SETS) -> None:
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive: {max_entries}")
+        self.max_entries: int = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def __contains__(self, key: tuple) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __setitem__(self, key: tuple, sizes) -> None:
+        with self._lock:
+            self._entries[key] = sizes
+            self._entries.move_to_end(key)
+            # 最も長く参照されていないものから捨てる
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class DatasetStore:
+    """
+    データセット・階層定義・frequency setのキャッシュをメモリ上に保持する
+    datasets: (dataset, dropna, size_limit) -> 前処理済みのデータセット
+    hierarchies: (dataset, column) -> child_level == 0 の階層定義df
+    freq_caches: (dataset, dropna, size_limit) -> Incognitoに渡すfrequency setのキャッシュ
+    max_frequency_sets: データセットごとに保持するfrequency setの数の上限
+    """
+
+    def __init__(self, max_frequency_sets: int = MAX_FREQUENCY_SETS) -> None:
+        if max_frequency_sets < 1:
+            raise ValueError(f"max_frequency_sets must be positive: {max_frequency_sets}")
+        self.datasets: Dict[tuple, pd.DataFrame] = {}
+        self.hierarchies: Dict[tuple, pd.DataFrame] = {}
+        self.freq_caches: Dict[tuple, FrequencySetCache] = {}
+        self.max_frequency_sets: int = max_frequency_sets
+        self._lock = threading.Lock()
+
+    def get_dataset(
+        self, dataset_name: str, dropna: bool = False, size_limit: Optional[int] = None
+    ) -> tuple:
+        """
+        前処理済みのデータセットと、それに対応するfrequency setのキャッシュを取得する
+        return: (dataset, freq_cache)
+        """
+        key = (dataset_name, dropna, size_limit)
+        with self._lock:
+            if key not in self.datasets:
+                vprint("Reading dataset:", dataset_name)
+                dataset = utils.read_dataset(dataset_name)
+                if size_limit is not None:
+                    dataset = dataset.head(size_limit)
+                if dropna:
+                    dataset = utils.dropna(dataset)
+                self.datasets[key] = dataset
+                self.freq_caches[key] = FrequencySetCache(self.max_frequency_sets)
+            return self.datasets[key], self.freq_caches[key]
+
+    def get_hierarchy(self, dataset_name: str, col_names: List[str]) -> pd.DataFrame:
+        """
+        col_namesの階層定義（child_level == 0 の行）を取得する
+        """
+        hierarchies_dir = f"Data/{dataset_name}/hierarchies"
+        with self._lock:
+            # 未読み込みの列の階層定義をまとめて（並列に）コンパイルする
+            missing = [
+                col_name
+                for col_name in col_names
+                if (dataset_name, col_name) not in self.hierarchies
+            ]
+            if missing:
+                vprint(f"Reading generalization hierarchies for {missing}...")
+                compiled = compile_hierarchies_by_col_names(missing, hierarchies_dir)
+                for col_name, compiled_hierarchy in zip(missing, compiled.values()):
+                    self.hierarchies[(dataset_name, col_name)] = to_hierarchy_frame(
+                        {compiled_hierarchy.column: compiled_hierarchy}
+                    )
+            hierarchies = [
+                self.hierarchies[(dataset_name, col_name)] for col_name in col_names
+            ]
+        return pd.concat(hierarchies, ignore_index=True)
+
+    def evict(self, dataset_name: Optional[str] = None, frequency_sets_only: bool = False) -> dict:
+        """
+        保持しているデータセットやfrequency setを解放する
+        実行中のジョブは取得済みのデータセット・キャッシュをそのまま使い続ける
+        param dataset_name: 対象のデータセット名。Noneのときはすべて
+        param frequency_sets_only: Trueのときはfrequency setのキャッシュのみ消去する
+        return: {"datasets": 解放したデータセット数, "frequency_sets": 消去したfrequency set数}
+        """
+        with self._lock:
+            keys = [
+                key for key in self.datasets if dataset_name is None or key[0] == dataset_name
+            ]
+            num_frequency_sets = 0
+            for key in keys:
+                num_frequency_sets += len(self.freq_caches[key])
+                if frequency_sets_only:
+                    self.freq_caches[key].clear()
+                else:
+                    del self.datasets[key]
+                    del self.freq_caches[key]
+            if not frequency_sets_only:
+                for hierarchy_key in list(self.hierarchies):
+                    if dataset_name is None or hierarchy_key[0] == dataset_name:
+                        del self.hierarchies[hierarchy_key]
+        return {
+            "datasets": 0 if frequency_sets_only else len(keys),
+            "frequency_sets": num_frequency_sets,
+        }
+
+    def status(self) -> dict:
+        with self._lock:
+            datasets = []
+            for key, dataset in self.datasets.items():
+                dataset_name, dropna, size_limit = key
+                datasets.append(
+                    {
+                        "dataset": dataset_name,
+                        "dropna": dropna,
+                        "size_limit": size_limit,
+                        "num_records": len(dataset),
+                        "cached_frequency_sets": len(self.freq_caches[key]),
+                    }
+                )
+            hierarchies = sorted(
+                f"{dataset_name}/{col_name}"
+                for (dataset_name, col_name) in self.hierarchies
+            )
+        return {
+            "datasets": datasets,
+            "hierarchies": hierarchies,
+            "max_frequency_sets": self.max_frequency_sets,
+        }
+
+
+class IncognitoService:
+    """
+    ジョブを受け付けてIncognitoを実行する
+    max_jobs: 同時に実行するジョブ数の上限。超えたジョブは空きが出るまで待機する
+    """
+
+    def __init__(self, store: DatasetStore, max_jobs: int = 1) -> None:
+        if max_jobs < 1:
+            raise ValueError(f"max_jobs must be positive: {max_jobs}")
+        self.store: DatasetStore = store
+        self.max_jobs: int = max_jobs
+        self._slots = threading.BoundedSemaphore(max_jobs)
+        self._running: int = 0
+        self._running_lock = threading.Lock()
+
+    def run_job(self, job: dict) -> dict:
+        """
+        1件のジョブを実行する
+        param job: {"dataset", "q_cols", "k", "dropna", "size_limit", "output"}
+        return: 実行結果のdict
+        """
+        if "q_cols" not in job or "k" not in job:
+            raise ValueError("Job must specify 'q_cols' and 'k'.")
+        dataset_name = job.get("dataset", "adult")
+        q_cols = list(job["q_cols"])
+        k = int(job["k"])
+        dropna = bool(job.get("dropna", False))
+        size_limit = job.get("size_limit")
+
+        dataset, freq_cache = self.store.get_dataset(dataset_name, dropna, size_limit)
+        hierarchy = self.store.get_hierarchy(dataset_name, q_cols)
+
+        with self._slots:
+            with self._running_lock:
+                self._running += 1
+            try:
+                vprint(f"Starting Incognito... with k={k} and quasi-identifiers: {q_cols}")
+                incognito = Incognito(dataset, hierarchy, k, freq_cache=freq_cache)
+                generalizations = incognito.run()
+                if job.get("output"):
+                    incognito.save_result(job["output"])
+            finally:
+                with self._running_lock:
+                    self._running -= 1
+
+        return {
+            "status": "ok",
+            "dataset": dataset_name,
+            "k": k,
+            "quasi_identifiers": incognito.Q,
+            "num_valid_generalizations": len(generalizations),
+            "generalizations": [
+                {col: int(level) for col, level in generalization}
+                for generalization in generalizations
+            ],
+            "execution_time": incognito.execution_time,
+            "num_records": len(dataset),
+            "output_dir": job.get("output"),
+        }
+
+    def evict(self, request: dict) -> dict:
+        """
+        param request: {"dataset", "frequency_sets_only"}
+        return: 解放した件数
+        """
+        evicted = self.store.evict(
+            request.get("dataset"), bool(request.get("frequency_sets_only", False))
+        )
+        return {"status": "ok", "evicted": evicted}
+
+    def status(self) -> dict:
+        status = self.store.status()
+        status["max_jobs"] = self.max_jobs
+        status["running_jobs"] = self._running
+        return status
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    service: IncognitoService  # set by make_server
+
+    def _send_json(self, code: int, body: dict) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        if self.path == "/status":
+            self._send_json(200, self.service.status())
+        else:
+            self._send_json(404, {"status": "error", "error": f"Unknown path: {self.path}"})
+
+    def do_POST(self) -> None:
+        handlers = {"/run": self.service.run_job, "/evict": self.service.evict}
+        if self.path not in handlers:
+            self._send_json(404, {"status": "error", "error": f"Unknown path: {self.path}"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            result = handlers[self.path](body)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"status": "error", "error": str(e)})
+            return
+        except Exception as e:
+            # 保存先への書き込み失敗など、ジョブ実行中のエラー
+            self.log_error("Job failed: %r", e)
+            self._send_json(500, {"status": "error", "error": f"{type(e).__name__}: {e}"})
+            return
+        self._send_json(200, result)
+
+    def address_string(self) -> str:
+        # Unix domain socket の場合 client_address は空文字列
+        if isinstance(self.client_address, tuple):
+            return super().address_string()
+        return "unix"
+
+    def log_message(self, format: str, *args) -> None:
+        # アクセスログは --verbose のときのみ
+        vprint(f"[{self.address_string()}] {format % args}")
+
+    def log_error(self, format: str, *args) -> None:
+        # ジョブの失敗などのエラーは常に記録する
+        sys.stderr.write(
+            f"[{self.address_string()}] [{self.log_date_time_string()}] {format % args}\n"
+        )
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+    service: IncognitoService,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    unix_socket: Optional[str] = None,
+) -> socketserver.BaseServer:
+    """
+    HTTPサーバを生成する
+    param unix_socket: 指定された場合はTCPの代わりにUnix domain socketで待ち受ける
+    """
+    handler = type("RequestHandler", (_RequestHandler,), {"service": service})
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            # 前回のサーバが残したsocketのみ削除する（指定ミスで通常のファイルを消さない）
+            if not stat.S_ISSOCK(os.stat(unix_socket).st_mode):
+                raise ValueError(f"{unix_socket} already exists and is not a socket.")
+            os.remove(unix_socket)
+        return _ThreadingUnixHTTPServer(unix_socket, handler)
+    return ThreadingHTTPServer((host, port), handler)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, unix_socket: str, timeout: Optional[float] = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.unix_socket: str = unix_socket
+
+    def connect(self) -> None:
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_socket)
+
+
+def request(
+    method: str,
+    path: str,
+    body: Optional[dict] = None,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    unix_socket: Optional[str] = None,
+    timeout: Optional[float] = None,
+) -> dict:
+    """
+    サーバにリクエストを送り、JSONのレスポンスを返す
+    接続の失敗やサーバのエラーは RuntimeError として送出する
+    """
+    if unix_socket is not None:
+        conn = _UnixHTTPConnection(unix_socket, timeout=timeout)
+        address = unix_socket
+    else:
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        address = f"{host}:{port}"
+    try:
+        payload = json.dumps(body).encode("utf-8") if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        conn.request(method, path, body=payload, headers=headers)
+        response = conn.getresponse()
+        result = json.loads(response.read())
+    except (OSError, http.client.HTTPException) as e:
+        raise RuntimeError(f"Request to {address} failed: {e}") from e
+    except json.JSONDecodeError as e:
+        raise RuntimeError(f"Invalid response from {address}: {e}") from e
+    finally:
+        conn.close()
+
+    if response.status != 200:
+        raise RuntimeError(result.get("error", f"HTTP {response.status}"))
+    return result
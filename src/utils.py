@@ -1,5 +1,7 @@
 import pandas as pd
 import os
+import sys
+from typing import Optional
 
 VERBOSE = False
 
@@ -12,15 +14,44 @@ def set_verbose(verbose: bool) -> None:
     VERBOSE = verbose
 
 
-def vprint(*args, **kwargs) -> None:
+def vprint(*args, verbose: Optional[bool] = None, **kwargs) -> None:
     """
     Print messages only if verbose mode is enabled.
+    param verbose: per-call verbosity. If None, the global verbose flag is used.
     """
-    if VERBOSE:
+    if verbose is None:
+        verbose = VERBOSE
+    if verbose:
         print(*args, **kwargs)
 
 
-def read_dataset(dataset_name: str) -> pd.DataFrame:
+def current_memory_bytes() -> Optional[int]:
+    """
+    このプロセスの現在の常駐メモリ (Linux のみ、それ以外は None)
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def peak_memory_bytes() -> Optional[int]:
+    """
+    このプロセスの起動からの最大常駐メモリ (Linux / macOS のみ、それ以外は None)
+    同じプロセスで複数回実行した場合は、それまでの全実行の最大値になる
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linuxは KiB、macOSは bytes 単位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def read_dataset(dataset_name: str, weight_col: Optional[str] = None) -> pd.DataFrame:
     """
     データセットを Data ディレクトリから読み込む
     Dataset directory structure:
@@ -32,6 +63,8 @@ def read_dataset(dataset_name: str) -> pd.DataFrame:
                 ...
 
     param: dataset_name: データセット名
+    param: weight_col: 各行が表すレコード数の列（集計済みのデータセットの場合）。
+        指定された場合は、列の存在と値が非負の整数であることを確認し、重み0の行を除く
     return: pd.DataFrame: 読み込んだデータセット
     """
     if dataset_name not in ["adult", "atus", "cup", "fars", "ihis", "ACS13_ma"]:
@@ -46,19 +79,30 @@ def read_dataset(dataset_name: str) -> pd.DataFrame:
     else:
         raise ValueError(f"Dataset file ({dataset_path}) does not exist.")
 
+    if weight_col is not None:
+        if weight_col not in data.columns:
+            raise ValueError(f"Weight column ({weight_col}) does not exist in {dataset_path}.")
+        weights = pd.to_numeric(data[weight_col], errors="coerce")
+        if weights.isna().any() or (weights < 0).any() or (weights % 1 != 0).any():
+            raise ValueError(f"Weight column ({weight_col}) must hold non-negative integers.")
+        data[weight_col] = weights.astype("int64")
+        # 重み0の行はレコードを表さないので除く（残すと大きさ0の同値クラスになる）
+        data = data[data[weight_col] > 0].reset_index(drop=True)
+
     return data
 
 
 def read_hierarchy_official_csv(file_path: str, col_name: str) -> pd.DataFrame:
     """
     read hierarchy from official csv file
+    All (child_level, parent_level) pairs are returned. If only level-0 mappings
+    are needed, hierarchy.compile_hierarchy is faster.
     param file_path: path to the hierarchy csv file
     return: hierarchy df
     """
     csv = pd.read_csv(file_path, sep=";", header=None)
-    hierarchy_df = pd.DataFrame(
-        columns=["child", "child_level", "parent", "parent_level"]
-    )
+    # 全ペアを集めてから一度だけ連結する（ループ内でconcatすると二乗のコストになる）
+    frames = []
     for child_col in range(csv.shape[1] - 1):
         for parent_col in range(child_col + 1, csv.shape[1]):
             csvf = csv.iloc[:, [child_col, parent_col]]
@@ -66,7 +110,13 @@ def read_hierarchy_official_csv(file_path: str, col_name: str) -> pd.DataFrame:
             append_df = pd.DataFrame(csvf.values, columns=["child", "parent"])
             append_df["child_level"] = child_col
             append_df["parent_level"] = parent_col
-            hierarchy_df = pd.concat([hierarchy_df, append_df], ignore_index=True)
+            frames.append(append_df[["child", "child_level", "parent", "parent_level"]])
+    if frames:
+        hierarchy_df = pd.concat(frames, ignore_index=True)
+    else:
+        hierarchy_df = pd.DataFrame(
+            columns=["child", "child_level", "parent", "parent_level"]
+        )
 
     # csvとdatatable上のcol名が違うものは置換する
     if col_name == "salary-class":
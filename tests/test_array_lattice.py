@@ -0,0 +1,130 @@
+"""
+ArrayLattice が Lattice と同じノード・エッジを同じ順序で生成するかの比較
+各属性数で一部のノードを削除（枝刈り）してから次のLatticeを生成する
+"""
+
+import random
+
+import pandas as pd
+import pytest
+
+from src.array_lattice import ArrayLattice
+from src.incognito import Incognito
+from src.lattice import Lattice
+
+
+def _hierarchy(heights: dict) -> pd.DataFrame:
+    """
+    column -> 階層の高さ から、Latticeの構築に使う階層定義df (child_level == 0 の行) を作る
+    """
+    rows = [
+        {
+            "child": "v",
+            "child_level": 0,
+            "parent": f"v{level}",
+            "parent_level": level,
+            "column": column,
+        }
+        for column, height in heights.items()
+        for level in range(1, height + 1)
+    ]
+    return pd.DataFrame(rows)
+
+
+def _num_nodes(lattice) -> int:
+    if isinstance(lattice, ArrayLattice):
+        return lattice.levels.shape[0]
+    return len(lattice.nodes)
+
+
+def _snapshot(lattice) -> dict:
+    """
+    インデックス順のノード（一般化変換・高さ・状態）とエッジ
+    """
+    nodes = [
+        (
+            tuple(lattice.generalization(i)),
+            lattice.height(i),
+            lattice.is_deleted(i),
+            lattice.is_marked(i),
+        )
+        for i in range(_num_nodes(lattice))
+    ]
+    edges = {
+        (tuple(lattice.generalization(i)), tuple(lattice.generalization(j)))
+        for i in range(_num_nodes(lattice))
+        for j in lattice.successors(i)
+    }
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "num_edges": lattice.num_edges(),
+        "active_nodes": lattice.active_nodes(),
+        "roots": lattice.roots(),
+    }
+
+
+@pytest.mark.parametrize(
+    "heights, delete_ratio, seed",
+    [
+        ({"a": 1, "b": 2}, 0.0, 0),
+        ({"age": 3, "sex": 1, "race": 2, "zip": 2}, 0.0, 0),
+        ({"age": 3, "sex": 1, "race": 2, "zip": 2}, 0.2, 1),
+        ({"age": 3, "sex": 1, "race": 2, "zip": 2, "edu": 1}, 0.3, 2),
+        ({"a": 1, "b": 2, "c": 1}, 0.5, 3),
+    ],
+)
+def test_array_lattice_matches_lattice(heights, delete_ratio, seed):
+    hierarchy = _hierarchy(heights)
+    lattice = Lattice(hierarchy)
+    array_lattice = ArrayLattice(hierarchy)
+    rng = random.Random(seed)
+
+    for _ in range(len(heights)):
+        lattice.increment_attributes()
+        array_lattice.increment_attributes()
+        assert _snapshot(array_lattice) == _snapshot(lattice)
+
+        # 同じノードを削除・マークして次の属性数に進む
+        for i in lattice.active_nodes():
+            r = rng.random()
+            if r < delete_ratio:
+                lattice.delete(i)
+                array_lattice.delete(i)
+            elif r < delete_ratio + 0.1:
+                lattice.mark(i)
+                array_lattice.mark(i)
+        assert _snapshot(array_lattice) == _snapshot(lattice)
+
+
+def test_incognito_results_match():
+    # 実際の枝刈りでも同じ結果になるか
+    rng = random.Random(0)
+    heights = {"a": 2, "b": 1, "c": 3}
+    T = pd.DataFrame(
+        {
+            column: [rng.randrange(2**height) for _ in range(200)]
+            for column, height in heights.items()
+        }
+    )
+    # level-jの値は level-0の値を 2**j で割ったもの
+    hierarchy = pd.DataFrame(
+        [
+            {
+                "child": value,
+                "child_level": 0,
+                "parent": value // 2**level,
+                "parent_level": level,
+                "column": column,
+            }
+            for column, height in heights.items()
+            for value in range(2**height)
+            for level in range(1, height + 1)
+        ]
+    )
+    results = [
+        Incognito(T, hierarchy, k=10, lattice_backend=lattice_backend).run()
+        for lattice_backend in ["object", "array"]
+    ]
+    assert results[0] == results[1]
+    assert len(results[0]) > 0
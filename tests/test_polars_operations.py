@@ -0,0 +1,65 @@
+"""
+polarsバックエンドがpandasバックエンドと同じ結果になるかの比較
+"""
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.incognito import Incognito
+
+pytest.importorskip("polars")
+
+
+def test_float_column_with_nan_matches_pandas():
+    # NaNを含むためfloatになった列と、intで定義された階層
+    rng = random.Random(0)
+    T = pd.DataFrame(
+        {
+            "age": [rng.choice([20, 30, 40, 50, np.nan]) for _ in range(40)],
+            "sex": [rng.choice(["M", "F"]) for _ in range(40)],
+        }
+    )
+    rows = []
+    for age in [20, 30, 40, 50]:
+        parent = "young" if age < 35 else "old"
+        rows.append(dict(child=age, child_level=0, parent=parent, parent_level=1, column="age"))
+        rows.append(dict(child=age, child_level=0, parent="*", parent_level=2, column="age"))
+    for sex in ["M", "F"]:
+        rows.append(dict(child=sex, child_level=0, parent="*", parent_level=1, column="sex"))
+    hierarchy = pd.DataFrame(rows)
+
+    for k in [3, 6, 9]:
+        results = [
+            Incognito(T, hierarchy, k, backend=backend).run()
+            for backend in ["pandas", "polars"]
+        ]
+        assert results[0] == results[1]
+        assert len(results[0]) > 0
+
+
+def test_bool_column_matches_pandas():
+    rng = random.Random(1)
+    T = pd.DataFrame(
+        {
+            "smoker": [rng.random() < 0.3 for _ in range(60)],
+            "sex": [rng.choice(["M", "F"]) for _ in range(60)],
+        }
+    )
+    hierarchy = pd.DataFrame(
+        [
+            dict(child=value, child_level=0, parent="*", parent_level=1, column=column)
+            for column, values in [("smoker", [True, False]), ("sex", ["M", "F"])]
+            for value in values
+        ]
+    )
+
+    for k in [5, 15, 30]:
+        results = [
+            Incognito(T, hierarchy, k, backend=backend).run()
+            for backend in ["pandas", "polars"]
+        ]
+        assert results[0] == results[1]
+        assert len(results[0]) > 0